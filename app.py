@@ -15,43 +15,314 @@ IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 or implied.
 """
 
+# Heavy dependencies (requests, yaml, pyATS, pandas) are imported in the phase that needs
+# them, so a run that fails early, e.g. on DNAC authentication, does not pay for them.
+
+import argparse
 import os
-from dotenv import load_dotenv
-from device_collector import DeviceCollector
-from dnac_collector import DNACCollector
-from custom_report import CustomReport
-from dnac_api import DNACenterAPI
-from testbed_creator import TestbedCreator
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from run_metrics import metrics
+from startup_profile import ImportTimeProfiler
 
-load_dotenv()
 
-if __name__ == "__main__":
+def parse_arguments():
+
+    parser = argparse.ArgumentParser(description="Creates a VLAN report with the uptime and down time per interface.")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Report the import time per module and phase at the end of the run.")
+    parser.add_argument('--startup-budget', type=float, default=None,
+                        help="Warn if the total import time exceeds this number of seconds.")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Generate the DNAC VLAN report only after all devices were polled, instead of concurrently.")
+    parser.add_argument('--target-report-devices', action='store_true',
+                        help="Retrieve the DNAC VLAN report first and only poll the devices and interfaces it contains.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip devices already polled successfully by the previous (or --run-id) run.")
+    parser.add_argument('--clear-health-cache', action='store_true',
+                        help="Forget all recorded device failures, so every device is polled again.")
+    parser.add_argument('--run-id', default=None,
+                        help="Id of the run in the device results spool. Defaults to the current time, or the last run with --resume.")
+    parser.add_argument('--profile', default=None, metavar='PHASE',
+                        help="Profile the given phase, e.g. 'custom report', with cProfile and print the slowest calls.")
+
+    return parser.parse_args()
+
+
+def load_settings():
+    '''
+    Reads the settings from the environment and the .env file.
+    '''
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    return {
+        'testbed_filename': "testbed.yaml",
+        'spool_filename': "device_results.jsonl",
+        'health_cache_filename': "device_health.json",
+        'command': "show interfaces link",
+        'dnac_username': os.getenv('DNAC_USERNAME'),
+        'dnac_password': os.getenv('DNAC_PASSWORD'),
+        'dnac_base_url': os.getenv('DNAC_BASE_URL'),
+        'enable_username': os.getenv('ENABLE_USERNAME'),
+        'enable_password': os.getenv('ENABLE_PASSWORD'),
+        'max_workers': int(os.getenv('MAX_WORKERS') or 1),
+        'device_timeout': int(os.getenv('DEVICE_TIMEOUT') or 60),
+        'device_parser': os.getenv('DEVICE_PARSER') or 'genie',
+        'dnac_pool_size': int(os.getenv('DNAC_POOL_SIZE') or 10),
+        'dnac_timeout': int(os.getenv('DNAC_TIMEOUT') or 30),
+        'report_deadline': int(os.getenv('REPORT_DEADLINE') or 1800),
+        'view_cache_ttl': int(os.getenv('VIEW_CACHE_TTL') or 86400),
+        'inventory_workers': int(os.getenv('INVENTORY_WORKERS') or 1),
+        'dnac_data_source': os.getenv('DNAC_DATA_SOURCE') or 'report',
+        'report_shard_workers': int(os.getenv('REPORT_SHARD_WORKERS') or 0),
+        'report_shard_retries': int(os.getenv('REPORT_SHARD_RETRIES') or 2),
+        'report_download_folder': os.getenv('REPORT_DOWNLOAD_FOLDER') or None,
+        'report_chunk_size': int(os.getenv('REPORT_CHUNK_SIZE') or 100000),
+        'report_duration_text': (os.getenv('REPORT_DURATION_TEXT') or 'yes').lower() in ('yes', 'true', '1'),
+        'output_format': os.getenv('OUTPUT_FORMAT') or 'csv',
+        'output_path': os.getenv('OUTPUT_PATH') or None,
+        'history_database': os.getenv('HISTORY_DATABASE') or None,
+        'fingerprint_filename': "report_fingerprint.pkl",
+        'delta_report': (os.getenv('DELTA_REPORT') or 'no').lower() in ('yes', 'true', '1'),
+        'delta_output_path': os.getenv('DELTA_OUTPUT_PATH') or None,
+        'spool_keep_runs': int(os.getenv('SPOOL_KEEP_RUNS') or 5),
+        'health_failure_threshold': int(os.getenv('HEALTH_FAILURE_THRESHOLD') or 2),
+        'health_backoff': int(os.getenv('HEALTH_BACKOFF') or 900),
+        'daemon_interval': int(os.getenv('DAEMON_INTERVAL') or 900),
+        'inventory_interval': int(os.getenv('INVENTORY_INTERVAL') or 3600),
+        'pool_max_connections': int(os.getenv('POOL_MAX_CONNECTIONS') or 500),
+        'pool_idle_timeout': int(os.getenv('POOL_IDLE_TIMEOUT') or 0),
+        'service_host': os.getenv('SERVICE_HOST') or '127.0.0.1',
+        'metrics_json_filename': os.getenv('METRICS_JSON_FILE') or None,
+        'metrics_prometheus_filename': os.getenv('METRICS_PROMETHEUS_FILE') or None
+    }
+
+
+def set_phase(profiler, phase):
+    '''
+    Starts the next phase of the run, both for the import time profiler, if any, and the run metrics.
+    '''
+
+    if profiler is not None:
+        profiler.set_phase(phase)
+    metrics.set_phase(phase)
+
+
+def run(settings, profiler, args):
+    '''
+    Runs all phases. The DNAC VLAN report is generated server-side while the devices are
+    polled, and both are only joined for the custom report. With --sequential, the
+    report is generated after the device collection finished. With --target-report-devices,
+    the report is retrieved first and only the devices and interfaces in it are polled.
+    '''
+
+    set_phase(profiler, 'dnac authentication')
+    from dnac_api import DNACenterAPI
+    dnac_api = DNACenterAPI(settings['dnac_username'], settings['dnac_password'], settings['dnac_base_url'],
+                            settings['dnac_pool_size'], settings['dnac_timeout'])
+
+    # The DNAC report may run in the background, so its metrics phase is timed by get_dnac_data itself
+    profiler.set_phase('dnac report')
+    metrics.set_phase(None)
+    dnac_collector, get_dnac_data = create_dnac_collector(settings, dnac_api)
+
+    collected_dnac_data, report_id = None, None
+
+    try:
+        if args.target_report_devices:
+            collected_dnac_data, report_id = get_dnac_data()
+
+            set_phase(profiler, 'report targets')
+            from custom_report import CustomReport
+            custom_report = CustomReport(settings['report_chunk_size'], settings['report_duration_text'])
+            targets = custom_report.get_report_targets(
+                custom_report.read_dnac_report(collected_dnac_data, columns=['IP Address', 'Interface Name']))
+
+            collected_device_data = collect_device_data(settings, dnac_api, profiler, args, targets)
+
+        else:
+            collected_device_data, collected_dnac_data, report_id = collect_with_dnac_data(
+                dnac_collector, get_dnac_data,
+                lambda cancel_event: collect_device_data(settings, dnac_api, profiler, args, cancel_event=cancel_event),
+                profiler, args.sequential)
+
+        set_phase(profiler, 'custom report')
+        create_custom_report(settings, collected_device_data, collected_dnac_data)
+
+    finally:
+        release_dnac_data(dnac_collector, collected_dnac_data, report_id)
+
+
+def collect_with_dnac_data(dnac_collector, get_dnac_data, collect_devices, profiler=None, sequential=False):
+    '''
+    Collects the device data with collect_devices while get_dnac_data generates the DNAC VLAN
+    data in the background, or after the device collection with sequential. Returns the device
+    data, the DNAC data and the id of the report to delete with release_dnac_data. Both functions
+    are passed a cancel event: if the DNAC report fails, the device collection is cancelled, and if
+    the device collection fails, the report is cancelled and deleted before the exception is raised.
+    '''
+
+    cancel_event = threading.Event()
+
+    def cancel_on_failure(report_future):
+        if report_future.exception() is not None:
+            cancel_event.set()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        report_future = None
+
+        try:
+            if not sequential:
+                report_future = executor.submit(get_dnac_data, cancel_event)
+                report_future.add_done_callback(cancel_on_failure)
+
+            collected_device_data = collect_devices(cancel_event)
 
-    testbed_filename = "testbed.yaml"
-    command = "show interfaces link"
-    dnac_username = os.getenv('DNAC_USERNAME')
-    dnac_password = os.getenv('DNAC_PASSWORD')
-    dnac_base_url = os.getenv('DNAC_BASE_URL')
-    enable_username = os.getenv('ENABLE_USERNAME')
-    enable_password = os.getenv('ENABLE_PASSWORD')
-    
-    dnac_api = DNACenterAPI(dnac_username, dnac_password, dnac_base_url)
+            if sequential:
+                report_future = executor.submit(get_dnac_data, cancel_event)
 
-    testbed_creator = TestbedCreator(dnac_api, testbed_filename, enable_username, enable_password)
-    testbed_creator.populate_testbed_file()
+            set_phase(profiler, 'dnac report wait')
+            collected_dnac_data, report_id = report_future.result()
 
-    device_collector = DeviceCollector(testbed_filename, command)
-    collected_device_data = device_collector.parse_all_devices()
+        except BaseException:
+            cancel_event.set()
+            if report_future is not None and report_future.exception() is None:
+                release_dnac_data(dnac_collector, *report_future.result())
+            raise
+
+    return collected_device_data, collected_dnac_data, report_id
+
+
+def release_dnac_data(dnac_collector, collected_dnac_data, report_id):
+    '''
+    Deletes the DNAC VLAN report, if there is one, and removes the downloaded report file.
+    '''
+
+    if report_id is not None:
+        dnac_collector.discard_report(report_id, collected_dnac_data)
+
+    elif isinstance(collected_dnac_data, pathlib.Path) and collected_dnac_data.exists():
+        os.remove(collected_dnac_data)
+
+
+def create_custom_report(settings, collected_device_data, collected_dnac_data, report_consumers=()):
+    '''
+    Joins the device data with the DNAC VLAN data into the custom report. With HISTORY_DATABASE,
+    the report is also appended to the uptime history, with DELTA_REPORT the changed rows are
+    written to the delta report. The report is passed to the given report_consumers as well.
+    '''
+
+    from custom_report import CustomReport
+    custom_report = CustomReport(settings['report_chunk_size'], settings['report_duration_text'],
+                                 settings['output_format'], settings['output_path'])
+    report_consumers = list(report_consumers)
+
+    if settings['history_database']:
+        from uptime_history import UptimeHistory
+        uptime_history = UptimeHistory(settings['history_database'])
+        report_consumers.append(uptime_history.record_run(getattr(collected_device_data, 'run_id', None)))
+
+    if settings['delta_report']:
+        from report_delta import ReportDeltaTracker
+        report_consumers.append(ReportDeltaTracker(settings['fingerprint_filename'], settings['output_format'],
+                                                   settings['delta_output_path']))
+
+    custom_report.create_custom_report(collected_device_data, collected_dnac_data, report_consumers)
+
+    if settings['history_database']:
+        uptime_history.close()
+
+
+def create_dnac_collector(settings, dnac_api):
+    '''
+    Returns the collector for the DNAC VLAN data and a function returning the data and the
+    id of the report to delete afterwards. With DNAC_DATA_SOURCE="intent", the data is built
+    from the intent API and there is no report to delete. With REPORT_SHARD_WORKERS, one report
+    per building is retrieved, and the reports are deleted as soon as they were downloaded.
+    The function records its duration as the 'dnac report' phase, on whichever thread it runs,
+    and stops early once the cancel event passed to it is set.
+    '''
+
+    if settings['dnac_data_source'] == 'intent':
+        from dnac_intent_collector import DNACIntentCollector
+        dnac_collector = DNACIntentCollector(dnac_api, settings['inventory_workers'])
+        get_dnac_data = lambda cancel_event=None: (dnac_collector.get_VLAN_interface_data(cancel_event=cancel_event), None)
+
+    else:
+        from dnac_collector import DNACCollector
+        from view_cache import ReportViewCache
+        view_cache = ReportViewCache(".dnac_view_cache.json", settings['dnac_base_url'], settings['view_cache_ttl'])
+        dnac_collector = DNACCollector(dnac_api, settings['report_deadline'], view_cache=view_cache,
+                                       download_folder=settings['report_download_folder'],
+                                       inventory_workers=settings['inventory_workers'])
+
+        def get_sharded_VLAN_report(cancel_event=None):
+            from custom_report import CustomReport
+            custom_report = CustomReport(settings['report_chunk_size'], settings['report_duration_text'])
+            return dnac_collector.get_sharded_VLAN_report(custom_report.read_dnac_report, settings['report_shard_workers'],
+                                                          settings['report_shard_retries'], cancel_event)
+
+        get_dnac_data = get_sharded_VLAN_report if settings['report_shard_workers'] > 0 else dnac_collector.get_custom_VLAN_report
+
+    def get_timed_dnac_data(cancel_event=None):
+        with metrics.phase('dnac report'):
+            return get_dnac_data(cancel_event)
+
+    return dnac_collector, get_timed_dnac_data
+
+
+def collect_device_data(settings, dnac_api, profiler, args, targets=None, cancel_event=None):
+    '''
+    Populates the testbed from the DNAC inventory and polls all devices of the testbed.
+    The results are streamed to the device results spool. Devices in backoff after
+    repeated failures are skipped. With targets, a dictionary of device IP to interface
+    names, only these devices are polled and only these interfaces are kept. Once cancel_event
+    is set, the remaining devices are skipped.
+    '''
+
+    set_phase(profiler, 'testbed')
+    from testbed_creator import TestbedCreator
+    testbed_creator = TestbedCreator(dnac_api, settings['testbed_filename'], settings['enable_username'],
+                                     settings['enable_password'], settings['inventory_workers'])
+    testbed = testbed_creator.populate_testbed_file(set(targets) if targets is not None else None) or settings['testbed_filename']
+
+    set_phase(profiler, 'device collection')
+    from device_collector import DeviceCollector
+    from device_health import DeviceHealthCache
+    from results_spool import ResultsSpool
+    spool = ResultsSpool(settings['spool_filename'], args.run_id, args.resume, settings['spool_keep_runs'])
+    health_cache = DeviceHealthCache(settings['health_cache_filename'], settings['health_failure_threshold'],
+                                     settings['health_backoff'])
+    if args.clear_health_cache:
+        health_cache.clear()
+    device_collector = DeviceCollector(testbed, settings['command'], settings['max_workers'],
+                                       settings['device_timeout'], settings['device_parser'], spool, health_cache,
+                                       targets, cancel_event=cancel_event)
+
+    return device_collector.parse_all_devices()
+
+
+if __name__ == "__main__":
 
-    dnac_collector = DNACCollector(dnac_api)
-    collected_dnac_data, report_id = dnac_collector.get_custom_VLAN_report()
- 
-    custom_report = CustomReport()
-    custom_report = custom_report.create_custom_report(collected_device_data, collected_dnac_data)
+    args = parse_arguments()
+    profiler = ImportTimeProfiler()
 
-    dnac_collector.delete_report(report_id)
-        
+    if args.startup_profile:
+        profiler.install()
 
+    if args.profile:
+        metrics.profile(args.profile)
 
+    settings = load_settings()
 
-    
\ No newline at end of file
+    try:
+        run(settings, profiler, args)
+    finally:
+        metrics.finish()
+        metrics.export(settings['metrics_json_filename'], settings['metrics_prometheus_filename'])
+        if args.startup_profile:
+            profiler.uninstall()
+            profiler.report(args.startup_budget)
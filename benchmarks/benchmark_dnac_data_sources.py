@@ -0,0 +1,69 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Compares the report round trip of the DNACCollector with the DNACIntentCollector
+against a local stub DNA Center, and checks both return the same rows.
+
+Usage: python3 benchmarks/benchmark_dnac_data_sources.py [devices] [latency in s] [report delay in s] [workers]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_report import CustomReport
+from dnac_api import DNACenterAPI
+from dnac_collector import DNACCollector
+from dnac_intent_collector import DNACIntentCollector
+from stub_dnac import StubDNACServer, synthetic_inventory
+
+
+if __name__ == "__main__":
+
+    device_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    report_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 30
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 16
+
+    stub = StubDNACServer(synthetic_inventory(device_count), latency=latency, report_delay=report_delay).start()
+
+    try:
+        dnac_api = DNACenterAPI('user', 'password', stub.base_url, pool_size=workers)
+
+        start = time.perf_counter()
+        dnac_collector = DNACCollector(dnac_api)
+        report_content, report_id = dnac_collector.get_custom_VLAN_report()
+        report_data = CustomReport().read_dnac_report(report_content)
+        dnac_collector.delete_report(report_id)
+        report_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        intent_data = DNACIntentCollector(dnac_api, workers).get_VLAN_interface_data()
+        intent_duration = time.perf_counter() - start
+
+        key_columns = ['IP Address', 'Interface Name', 'Vlan Id', 'Operational Status']
+        report_keys = sorted(map(tuple, report_data[key_columns].astype(str).values.tolist()))
+        intent_keys = sorted(map(tuple, intent_data[key_columns].astype(str).values.tolist()))
+        assert report_keys == intent_keys, "Report and intent API returned different rows"
+
+        print(f"\n{device_count} devices, {len(report_data)} rows, {latency * 1000:.0f} ms latency, {report_delay:.0f} s report execution")
+        print(f"report round trip:         {report_duration:8.2f} s")
+        print(f"intent API ({workers:>2} workers):  {intent_duration:8.2f} s")
+
+    finally:
+        stub.stop()
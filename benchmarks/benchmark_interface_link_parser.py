@@ -0,0 +1,102 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Compares the InterfaceLinkParser with the Genie parser on the "show interfaces link"
+outputs in benchmarks/outputs, and checks both return the same uptime and down time per
+canonical interface name. Genie keeps some short names, e.g. Ap1/0/1, so the names of both
+parsers are normalized before comparing. Genie drops the rows with durations of more than
+a year, e.g. 2y23w, which the fast parser keeps. These rows are compared separately: they
+must be exactly the rows with a year in the down time or uptime.
+
+Usage: python3 benchmarks/benchmark_interface_link_parser.py [iterations]
+"""
+
+import glob
+import os
+import sys
+import time
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_FOLDER))
+
+from interface_link_parser import InterfaceLinkParser
+from interface_normalizer import InterfaceNameNormalizer
+
+COMMAND = "show interfaces link"
+
+
+def genie_device():
+
+    start = time.perf_counter()
+    from genie.conf.base import Device
+    device = Device('benchmark', os='iosxe')
+    device.custom.setdefault('abstraction', {})['order'] = ['os']
+    print(f"Genie import: {time.perf_counter() - start:.3f} s")
+
+    return device
+
+
+def times_of(parsed_output, interface_normalizer):
+    return {interface_normalizer.normalize(interface): (values.get('down_time'), values.get('up_time'))
+            for interface, values in parsed_output['interfaces'].items()}
+
+
+def compare(fast_times, genie_times, filename):
+    '''
+    Asserts both parsers return the same times for the interfaces Genie parsed, and that Genie
+    only dropped rows with a duration of more than a year. Returns the number of dropped rows.
+    '''
+
+    dropped = {interface: times for interface, times in fast_times.items() if interface not in genie_times}
+
+    assert set(genie_times) <= set(fast_times), f"Fast parser misses {set(genie_times) - set(fast_times)} of {filename}"
+    assert {interface: fast_times[interface] for interface in genie_times} == genie_times, f"Parsers disagree on {filename}"
+    assert all(any(time and 'y' in time for time in times) for times in dropped.values()), \
+        f"Genie dropped rows without a year of {filename}: {dropped}"
+
+    return len(dropped)
+
+
+def measure(function, output, iterations):
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(output)
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    fast_parser = InterfaceLinkParser()
+    interface_normalizer = InterfaceNameNormalizer()
+    device = genie_device()
+    genie_parse = lambda output: device.parse(COMMAND, output=output)
+
+    print(f"{'output':<12} {'interfaces':>10} {'genie drops':>11} {'genie ms':>10} {'fast ms':>10} {'speedup':>8}")
+
+    for filename in sorted(glob.glob(os.path.join(BENCHMARK_FOLDER, 'outputs', '*.txt'))):
+        with open(filename) as output_file:
+            output = output_file.read()
+
+        fast_output = fast_parser.parse(output)
+        assert fast_output is not None, f"Fast parser did not recognize {filename}"
+        dropped = compare(times_of(fast_output, interface_normalizer), times_of(genie_parse(output), interface_normalizer), filename)
+
+        genie_time = measure(genie_parse, output, iterations)
+        fast_time = measure(fast_parser.parse, output, iterations)
+        print(f"{os.path.basename(filename):<12} {len(fast_output['interfaces']):>10} {dropped:>11} "
+              f"{genie_time * 1000:>10.3f} {fast_time * 1000:>10.3f} {genie_time / fast_time:>7.0f}x")
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Compares the per-row cost of the former regex based interface abbreviation with
+the InterfaceNameNormalizer on a synthetic report.
+
+Usage: python3 benchmarks/benchmark_interface_normalizer.py [number of rows]
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas
+from interface_normalizer import InterfaceNameNormalizer
+
+INTERFACE_TYPES = ['GigabitEthernet', 'TwoGigabitEthernet', 'TenGigabitEthernet', 'TwentyFiveGigE', 'FortyGigabitEthernet']
+
+
+def synthetic_interface_names(row_count):
+    '''
+    Interface names of 48 port stacks with up to 8 members and 8 uplinks per member.
+    '''
+    names = []
+    for index in range(row_count):
+        member = index % 8 + 1
+        port = index // 8 % 56 + 1
+        if port > 48:
+            names.append(f"{INTERFACE_TYPES[2 + index % 3]}{member}/1/{port - 48}")
+        else:
+            names.append(f"{INTERFACE_TYPES[index % 2]}{member}/0/{port}")
+    return pandas.Series(names)
+
+
+def regex_abbreviation(interface_name):
+
+    if re.findall(r"\d+(?:/\d+)+", interface_name) != []:
+        return interface_name[:2] + re.findall(r"\d+(?:/\d+)+", interface_name)[0]
+    elif re.findall(r"(\d+)", interface_name) != []:
+        return interface_name[:2] + re.findall(r"(\d+)", interface_name)[0]
+    return interface_name[:2]
+
+
+def measure(label, function, row_count):
+
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    print(f"{label:<32} {duration:8.3f} s {duration / row_count * 1e9:10.1f} ns/row")
+
+
+if __name__ == "__main__":
+
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    interface_names = synthetic_interface_names(row_count)
+    print(f"Normalizing {row_count} interface names ({interface_names.nunique()} distinct)")
+
+    measure("per-row regex (previous)", lambda: [regex_abbreviation(name) for name in interface_names], row_count)
+    measure("normalize() per row", lambda: list(map(InterfaceNameNormalizer().normalize, interface_names)), row_count)
+    measure("normalize_series()", lambda: InterfaceNameNormalizer().normalize_series(interface_names), row_count)
@@ -0,0 +1,60 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Fetches the inventory of a local stub DNA Center page by page and concurrently,
+and checks that both return the same devices in the same order.
+
+Usage: python3 benchmarks/benchmark_inventory_paging.py [devices] [latency in s] [workers]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dnac_api import DNACenterAPI
+from stub_dnac import StubDNACServer, synthetic_inventory
+from testbed_creator import TestbedCreator
+
+
+if __name__ == "__main__":
+
+    device_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    stub = StubDNACServer(synthetic_inventory(device_count), latency=latency).start()
+
+    try:
+        dnac_api = DNACenterAPI('user', 'password', stub.base_url, pool_size=workers)
+        results = {}
+
+        for worker_count in [1, workers]:
+            testbed_creator = TestbedCreator(dnac_api, None, 'user', 'password', worker_count)
+            start = time.perf_counter()
+            results[worker_count] = testbed_creator.get_dnac_inventory_devices()
+            results[worker_count, 'duration'] = time.perf_counter() - start
+
+        assert results[1] == results[workers], "Concurrent paging returned different devices"
+        assert len(results[1]) == device_count, f"Expected {device_count} devices, got {len(results[1])}"
+
+        print(f"\n{device_count} devices, {latency * 1000:.0f} ms latency per request")
+        print(f"serial paging:              {results[1, 'duration']:8.2f} s")
+        print(f"concurrent paging ({workers:>2} w): {results[workers, 'duration']:8.2f} s")
+
+    finally:
+        stub.stop()
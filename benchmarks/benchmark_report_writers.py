@@ -0,0 +1,78 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Compares the write time and file size of the custom report output formats on a
+synthetic joined report, written in chunks like CustomReport does. Formats whose
+optional dependency (pyarrow, zstandard) is not installed are skipped.
+
+Usage: python3 benchmarks/benchmark_report_writers.py [number of rows] [chunk size]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas
+from custom_report import CustomReport
+from report_writers import REPORT_FORMATS, create_report_writer
+from stub_dnac import StubDNACServer, synthetic_inventory
+
+
+def synthetic_report(row_count):
+    '''
+    A joined custom report with the dtypes of CustomReport, 48 ports per device.
+    '''
+    ports_per_device = 48
+    devices = synthetic_inventory(row_count // ports_per_device + 1)
+    content = StubDNACServer(devices, ports_per_device=ports_per_device).get_report_content()
+    custom_report = CustomReport()
+    report_data = custom_report.read_dnac_report(content).head(row_count)
+
+    seconds = pandas.Series(range(len(report_data)), dtype='Int64') * 37 % 3000000
+    report_data['Uptime'] = [f"{value // 86400}d{value % 86400 // 3600:02d}h" for value in seconds]
+    report_data['Down Time'] = '00:00:00'
+    report_data['Uptime Seconds'] = seconds.values
+    report_data['Down Time Seconds'] = pandas.Series(0, index=report_data.index, dtype='Int64')
+
+    return report_data
+
+
+if __name__ == "__main__":
+
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    report_data = synthetic_report(row_count)
+    chunks = [report_data.iloc[start:start + chunk_size] for start in range(0, len(report_data), chunk_size)]
+
+    print(f"\n{len(report_data)} rows in {len(chunks)} chunks")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for output_format in REPORT_FORMATS:
+            output_path = os.path.join(folder, f"vlan_report.{output_format}")
+            start = time.perf_counter()
+            try:
+                with create_report_writer(output_format, output_path) as writer:
+                    for chunk in chunks:
+                        writer.write(chunk)
+            except ImportError as e:
+                print(f"{output_format:<10} skipped: {e}")
+                continue
+            duration = time.perf_counter() - start
+            print(f"{output_format:<10} {duration:8.2f} s {os.path.getsize(output_path) / 1048576:10.1f} MiB")
@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Synthetic fleet of IOS-XE switches for the DeviceCollector, without pyATS or SSH.
+The devices answer "show interfaces link" for the same ports and states the stub
+DNA Center reports for them, so the custom report joins every row.
+"""
+
+import time
+from types import SimpleNamespace
+
+COMMAND = "show interfaces link"
+
+
+def synthetic_interface_link_output(device, ports_per_device):
+    '''
+    Returns the "show interfaces link" output of an inventory device of the stub DNA Center.
+    Every third port is down, as in stub_dnac.synthetic_interfaces.
+    '''
+    index = int(device['id'].split('-')[1])
+    lines = [f"{'Port':<15}{'Name':<19}{'Down Time':<15}Up Time"]
+    for port in range(1, ports_per_device + 1):
+        seconds = (index * 7919 + port * 104729) % 40000000
+        if seconds < 86400:
+            duration = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        elif seconds < 604800:
+            duration = f"{seconds // 86400}d{seconds // 3600 % 24:02d}h"
+        else:
+            duration = f"{seconds // 604800}w{seconds // 86400 % 7}d"
+        if (port + index) % 3 == 0:
+            lines.append(f"{f'Gi1/0/{port}':<15}{'':<19}{duration}")
+        else:
+            lines.append(f"{f'Gi1/0/{port}':<15}{'Access':<19}{'00:00:00':<15}{duration}")
+    return '\n'.join(lines) + '\n'
+
+
+class FakeDevice():
+    '''
+    Stand-in for a pyATS device with the methods the DeviceCollector and DeviceConnectionPool use.
+    Connecting and executing take connect_latency and execute_latency seconds. The output is
+    parsed by the Genie parser of an IOS-XE device, as for a real pyATS device.
+    '''
+
+    def __init__(self, inventory_device, ports_per_device=48, connect_latency=0.0, execute_latency=0.0):
+
+        self.name = inventory_device['hostname']
+        self.connections = SimpleNamespace(cli=SimpleNamespace(ip=inventory_device['managementIpAddress']))
+        self.output = synthetic_interface_link_output(inventory_device, ports_per_device)
+        self.connect_latency = connect_latency
+        self.execute_latency = execute_latency
+        self.connected = False
+        self.genie_device = None
+
+
+    def connect(self, **kwargs):
+        time.sleep(self.connect_latency)
+        self.connected = True
+
+
+    def is_connected(self):
+        return self.connected
+
+
+    def execute(self, command, timeout=None):
+
+        if not self.connected:
+            raise ConnectionError(f"{self.name} is not connected")
+        if command != COMMAND:
+            raise ValueError(f"{self.name} has no output for {command}")
+        time.sleep(self.execute_latency)
+        return self.output
+
+
+    def disconnect(self):
+        self.connected = False
+
+
+    def parse(self, command, output=None):
+
+        if self.genie_device is None:
+            from genie.conf.base import Device
+            self.genie_device = Device(self.name, os='iosxe')
+            self.genie_device.custom.setdefault('abstraction', {})['order'] = ['os']
+
+        return self.genie_device.parse(command, output=output)
+
+
+class FakeTestbed():
+    '''
+    Loaded testbed with a FakeDevice per inventory device, accepted by DeviceCollector as is.
+    '''
+
+    def __init__(self, inventory_devices, ports_per_device=48, connect_latency=0.0, execute_latency=0.0):
+
+        self.devices = {device['hostname']: FakeDevice(device, ports_per_device, connect_latency, execute_latency)
+                        for device in inventory_devices}
@@ -0,0 +1,259 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Runs the phases of app.py end to end against a stub DNA Center, in a separate process,
+and a fake switch fleet, and records the duration and peak memory of each phase. The
+results are appended to a JSONL history and compared with the previous run of the same
+scale, so regressions show up before the nightly jobs slow down.
+
+Usage: python3 benchmarks/run_benchmarks.py [--scale small medium large xlarge] [--devices N --ports N] [--parser genie|fast]
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_FOLDER))
+
+from fake_fleet import COMMAND, FakeTestbed
+from stub_dnac import StubDNACServer, synthetic_inventory
+
+SCALES = {
+    'small': (10, 48),
+    'medium': (1000, 48),
+    'large': (10000, 48),
+    'xlarge': (10000, 100)
+}
+
+
+def serve_stub(device_count, ports_per_device, latency, report_delay, port_queue):
+    '''
+    Runs the stub DNA Center in its own process, so it does not count towards the measured memory.
+    '''
+    stub = StubDNACServer(synthetic_inventory(device_count), latency=latency, ports_per_device=ports_per_device,
+                          report_delay=report_delay)
+    port_queue.put(stub.server.server_address[1])
+    stub.server.serve_forever()
+
+
+class PhaseRecorder():
+    '''
+    Measures the duration and, unless disabled, the peak traced memory of each phase.
+    The output of the phase is captured unless verbose.
+    '''
+
+    def __init__(self, trace_memory=True, verbose=False):
+
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.phases = {}
+
+
+    @contextlib.contextmanager
+    def phase(self, name):
+
+        print(f"  {name} ...", flush=True)
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        with output:
+            yield
+        duration = time.perf_counter() - start
+
+        self.phases[name] = {'seconds': round(duration, 4)}
+        if self.trace_memory:
+            self.phases[name]['peak_mib'] = round((tracemalloc.get_traced_memory()[1] - memory_before) / 1048576, 2)
+
+
+def run_scale(scale, device_count, ports_per_device, args):
+    '''
+    Runs all phases for one scale and returns the benchmark record.
+    '''
+
+    from custom_report import CustomReport
+    from device_collector import DeviceCollector
+    from dnac_api import DNACenterAPI
+    from dnac_collector import DNACCollector
+    from results_spool import ResultsSpool
+    from testbed_creator import TestbedCreator
+
+    port_queue = multiprocessing.Queue()
+    stub_process = multiprocessing.Process(target=serve_stub, daemon=True,
+                                           args=(device_count, ports_per_device, args.dnac_latency, args.report_delay, port_queue))
+    stub_process.start()
+    base_url = f"http://127.0.0.1:{port_queue.get(timeout=600)}"
+
+    print(f"\n{scale}: {device_count} devices, {device_count * ports_per_device} report rows")
+    recorder = PhaseRecorder(not args.no_memory, args.verbose)
+
+    if recorder.trace_memory:
+        tracemalloc.start()
+
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+
+            with recorder.phase('dnac authentication'):
+                dnac_api = DNACenterAPI('user', 'password', base_url, pool_size=max(10, args.inventory_workers))
+
+            with recorder.phase('testbed'):
+                testbed_creator = TestbedCreator(dnac_api, os.path.join(folder, 'testbed.yaml'), 'user', 'password',
+                                                 args.inventory_workers)
+                DeviceCollector.load_testbed(testbed_creator.populate_testbed_file())
+
+            with recorder.phase('dnac report'):
+                dnac_collector = DNACCollector(dnac_api, poll_interval=0.1, download_folder=folder)
+                report_path, report_id = dnac_collector.get_custom_VLAN_report()
+                dnac_collector.delete_report(report_id)
+
+            # The loaded testbed would connect via SSH, so the devices are polled as fake fleet instead
+            with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO()):
+                inventory_devices = dnac_api.get_inventory_devices(args.inventory_workers)
+            testbed = FakeTestbed(inventory_devices, ports_per_device, args.device_latency, args.device_latency)
+
+            with recorder.phase('device collection'):
+                spool = ResultsSpool(os.path.join(folder, 'device_results.jsonl'))
+                device_collector = DeviceCollector(testbed, COMMAND, args.workers, parser=args.parser, spool=spool)
+                collected_device_data = device_collector.parse_all_devices()
+
+            with recorder.phase('custom report'):
+                custom_report = CustomReport(output_format=args.output_format,
+                                             output_path=os.path.join(folder, f"vlan_report.{args.output_format}"))
+                custom_report.create_custom_report(collected_device_data, report_path)
+
+    finally:
+        if recorder.trace_memory:
+            tracemalloc.stop()
+        stub_process.terminate()
+        stub_process.join()
+
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'scale': scale,
+        'devices': device_count,
+        'ports_per_device': ports_per_device,
+        'rows': device_count * ports_per_device,
+        'workers': args.workers,
+        'parser': args.parser,
+        'device_latency': args.device_latency,
+        'dnac_latency': args.dnac_latency,
+        'report_delay': args.report_delay,
+        'output_format': args.output_format,
+        'trace_memory': recorder.trace_memory,
+        'phases': recorder.phases,
+        'total_seconds': round(sum(phase['seconds'] for phase in recorder.phases.values()), 4)
+    }
+
+
+def git_commit():
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_FOLDER, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_record(history_filename, record):
+    '''
+    Returns the last record in the history with the same scale and settings, or None.
+    '''
+
+    comparable = ['devices', 'ports_per_device', 'workers', 'parser', 'device_latency', 'dnac_latency', 'report_delay',
+                  'output_format', 'trace_memory']
+    previous = None
+
+    if os.path.exists(history_filename):
+        with open(history_filename) as history_file:
+            for line in history_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if all(entry.get(key) == record[key] for key in comparable):
+                    previous = entry
+
+    return previous
+
+
+def print_record(record, previous):
+
+    print(f"\n{record['scale']} ({record['devices']} devices, {record['rows']} rows), commit {record['commit']}"
+          + (f", compared with {previous['commit']} of {previous['timestamp']}" if previous else ""))
+    print(f"{'phase':<22} {'seconds':>10} {'change':>8} {'peak MiB':>10}")
+
+    for name, phase in list(record['phases'].items()) + [('total', {'seconds': record['total_seconds']})]:
+        previous_seconds = None
+        if previous:
+            previous_seconds = previous['total_seconds'] if name == 'total' else previous['phases'].get(name, {}).get('seconds')
+        change = f"{(phase['seconds'] / previous_seconds - 1) * 100:+7.1f}%" if previous_seconds else ''
+        peak = f"{phase['peak_mib']:10.1f}" if 'peak_mib' in phase else ''
+        print(f"{name:<22} {phase['seconds']:>10.3f} {change:>8} {peak}")
+
+
+def parse_arguments():
+
+    parser = argparse.ArgumentParser(description="Benchmarks the phases of app.py against a stub DNA Center and a fake switch fleet.")
+    parser.add_argument('--scale', nargs='+', choices=list(SCALES), default=['small', 'medium'],
+                        help="Predefined scales: small (10 devices), medium (1k), large (10k), xlarge (10k devices, 1M rows).")
+    parser.add_argument('--devices', type=int, default=None, help="Custom number of devices, instead of --scale.")
+    parser.add_argument('--ports', type=int, default=48, help="Ports per device with --devices.")
+    parser.add_argument('--workers', type=int, default=32, help="Device collection workers.")
+    parser.add_argument('--parser', choices=['genie', 'fast'], default='genie',
+                        help="Parser of the device output, as DEVICE_PARSER. Defaults to genie, as app.py.")
+    parser.add_argument('--inventory-workers', type=int, default=8, help="Concurrent inventory page requests.")
+    parser.add_argument('--device-latency', type=float, default=0.0, help="Seconds per fake device connect and execute.")
+    parser.add_argument('--dnac-latency', type=float, default=0.0, help="Seconds added to every stub DNA Center request.")
+    parser.add_argument('--report-delay', type=float, default=1.0, help="Seconds until a stub report execution completes.")
+    parser.add_argument('--output-format', default='csv', help="Format of the custom report, see report_writers.REPORT_FORMATS.")
+    parser.add_argument('--no-memory', action='store_true', help="Do not trace memory, which slows down the phases.")
+    parser.add_argument('--verbose', action='store_true', help="Show the output of the phases.")
+    parser.add_argument('--history', default=os.path.join(BENCHMARK_FOLDER, 'results', 'history.jsonl'),
+                        help="JSONL file the results are appended to.")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = parse_arguments()
+    scales = [('custom', (args.devices, args.ports))] if args.devices else [(scale, SCALES[scale]) for scale in args.scale]
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+
+    for scale, (device_count, ports_per_device) in scales:
+        record = run_scale(scale, device_count, ports_per_device, args)
+        print_record(record, previous_record(args.history, record))
+
+        with open(args.history, 'a') as history_file:
+            history_file.write(json.dumps(record) + '\n')
+
+    print(f"\nResults appended to {args.history}")
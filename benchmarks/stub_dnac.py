@@ -0,0 +1,316 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Local stand-in for the DNA Center endpoints used by this script. It serves a
+synthetic inventory with interfaces and VLANs, runs VLAN reports that complete
+after report_delay seconds, and adds a configurable latency to every request.
+"""
+
+import csv
+import io
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEVICE_TYPES = ['Cisco Catalyst 9300 Switch', 'Cisco Catalyst 9500 Switch', 'Cisco Catalyst 9200L Switch']
+BUILDING_COUNT = 10
+
+
+def synthetic_sites():
+    '''
+    Returns the buildings the synthetic inventory devices are assigned to.
+    '''
+    return [{'id': f"site-building-{number}", 'name': f"Building {number}", 'siteNameHierarchy': f"Global/Site/Building {number}",
+             'additionalInfo': [{'nameSpace': 'Location', 'attributes': {'type': 'building'}}]}
+            for number in range(1, BUILDING_COUNT + 1)]
+
+
+def synthetic_inventory(device_count):
+    '''
+    Returns device_count network-device entries with unique hostnames and management IPs.
+    '''
+    devices = []
+    for index in range(device_count):
+        devices.append({
+            'id': f"device-{index:06d}",
+            'hostname': f"switch-{index:06d}",
+            'managementIpAddress': f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+            'type': DEVICE_TYPES[index % len(DEVICE_TYPES)],
+            'family': 'Switches and Hubs',
+            'locationName': f"Global/Site/Building {index % BUILDING_COUNT + 1}",
+            'platformId': 'C9300-48P',
+            'softwareVersion': '17.6.4'
+        })
+    return devices
+
+
+def synthetic_interfaces(device, ports_per_device):
+    '''
+    Returns the access ports of a device. Every third port is down and the VLAN changes every 12 ports.
+    '''
+    index = int(device['id'].split('-')[1])
+    interfaces = []
+    for port in range(1, ports_per_device + 1):
+        interfaces.append({
+            'portName': f"GigabitEthernet1/0/{port}",
+            'interfaceType': 'Physical',
+            'portMode': 'access',
+            'vlanId': str(10 + (port - 1) // 12 + index % 4 * 10),
+            'adminStatus': 'UP',
+            'status': 'down' if (port + index) % 3 == 0 else 'up'
+        })
+    return interfaces
+
+
+class StubDNACServer():
+
+    REPORT_COLUMNS = ['IP Address', 'Device Name', 'Location', 'Device Family', 'Device Type', 'Vlan Id',
+                      'Vlan Name', 'Interface Name', 'Admin Status', 'Operational Status']
+
+    def __init__(self, devices, latency=0.0, port=0, ports_per_device=48, report_delay=0.0):
+
+        self.devices = devices
+        self.devices_by_id = {device['id']: device for device in devices}
+        self.latency = latency
+        self.ports_per_device = ports_per_device
+        self.report_delay = report_delay
+        self.reports = {}
+        self.sites = synthetic_sites()
+        self.report_locations = {}
+        self.report_counter = 0
+        self.report_contents = {}
+        self.routes = [
+            ('POST', re.compile(r"^/dna/system/api/v1/auth/token$"), self.auth_token),
+            ('GET', re.compile(r"^/dna/intent/api/v1/network-device/count$"), self.device_count),
+            ('GET', re.compile(r"^/dna/intent/api/v1/network-device$"), self.device_list),
+            ('GET', re.compile(r"^/dna/intent/api/v1/network-device/([^/]+)/vlan$"), self.device_vlans),
+            ('GET', re.compile(r"^/dna/intent/api/v1/interface/network-device/([^/]+)$"), self.device_interfaces),
+            ('GET', re.compile(r"^/dna/intent/api/v1/site$"), self.site_list),
+            ('GET', re.compile(r"^/dna/intent/api/v1/data/view-groups$"), self.view_groups),
+            ('GET', re.compile(r"^/dna/intent/api/v1/data/view-groups/([^/]+)$"), self.views),
+            ('POST', re.compile(r"^/dna/intent/api/v1/data/reports$"), self.schedule_report),
+            ('GET', re.compile(r"^/dna/intent/api/v1/data/reports/([^/]+)/executions$"), self.report_executions),
+            ('GET', re.compile(r"^/dna/intent/api/v1/data/reports/([^/]+)/executions/([^/]+)$"), self.report_file),
+            ('DELETE', re.compile(r"^/dna/intent/api/v1/data/reports/([^/]+)$"), self.delete_report)
+        ]
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def handler_class(self):
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.dispatch(self, 'GET')
+
+            def do_POST(self):
+                stub.dispatch(self, 'POST')
+
+            def do_DELETE(self):
+                stub.dispatch(self, 'DELETE')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+    def dispatch(self, handler, method):
+
+        with self.lock:
+            self.request_count += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(handler.path)
+        query = parse_qs(url.query)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+
+        for route_method, pattern, function in self.routes:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                status, payload = function(query, body, *match.groups())
+                break
+        else:
+            status, payload = 404, {'message': f"No stub for {method} {url.path}"}
+
+        if isinstance(payload, (dict, list)):
+            content, content_type = json.dumps(payload).encode(), 'application/json'
+        else:
+            content, content_type = payload.encode(), 'text/csv'
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+
+    def auth_token(self, query, body):
+        return 200, {'Token': 'stub-token'}
+
+
+    def filtered_devices(self, query):
+
+        device_types = query.get('type')
+        if not device_types:
+            return self.devices
+        return [device for device in self.devices if device['type'] in device_types]
+
+
+    def device_count(self, query, body):
+        return 200, {'response': len(self.filtered_devices(query)), 'version': '1.0'}
+
+
+    def device_list(self, query, body):
+
+        offset = int(query.get('offset', ['1'])[0])
+        limit = int(query.get('limit', ['500'])[0])
+        devices = self.filtered_devices(query)
+
+        return 200, {'response': devices[offset - 1:offset - 1 + limit], 'version': '1.0'}
+
+
+    def device_interfaces(self, query, body, device_id):
+
+        if device_id not in self.devices_by_id:
+            return 404, {'response': {'errorCode': 'NotFound'}}
+        return 200, {'response': synthetic_interfaces(self.devices_by_id[device_id], self.ports_per_device), 'version': '1.0'}
+
+
+    def device_vlans(self, query, body, device_id):
+
+        if device_id not in self.devices_by_id:
+            return 404, {'response': {'errorCode': 'NotFound'}}
+        vlan_ids = sorted({int(interface['vlanId']) for interface in synthetic_interfaces(self.devices_by_id[device_id], self.ports_per_device)})
+        return 200, {'response': [{'vlanNumber': vlan_id, 'vlanName': f"VLAN{vlan_id:04d}", 'interfaceName': f"Vlan{vlan_id}",
+                                   'vlanType': 'ethernet'} for vlan_id in vlan_ids], 'version': '1.0'}
+
+
+    def site_list(self, query, body):
+
+        offset = int(query.get('offset', ['1'])[0])
+        limit = int(query.get('limit', ['500'])[0])
+        site_types = query.get('type')
+        sites = [site for site in self.sites if not site_types or site['additionalInfo'][0]['attributes']['type'] in site_types]
+
+        return 200, {'response': sites[offset - 1:offset - 1 + limit]}
+
+
+    def view_groups(self, query, body):
+        return 200, [{'category': 'Network Devices', 'viewGroupId': 'view-group-network-devices'}]
+
+
+    def views(self, query, body, view_group_id):
+        return 200, {'viewGroupId': view_group_id, 'views': [{'viewName': 'VLAN', 'viewId': 'view-vlan'}]}
+
+
+    def schedule_report(self, query, body):
+
+        report_definition = json.loads(body or b'{}')
+        locations = []
+        for report_filter in report_definition.get('view', {}).get('filters', []):
+            if report_filter.get('name') == 'Location':
+                locations = [value['displayValue'] for value in report_filter.get('value', [])]
+
+        with self.lock:
+            self.report_counter += 1
+            report_id = f"report-{self.report_counter}"
+            self.reports[report_id] = time.monotonic()
+            self.report_locations[report_id] = tuple(sorted(locations))
+        return 200, {'reportId': report_id, 'name': report_definition.get('name')}
+
+
+    def report_executions(self, query, body, report_id):
+
+        if report_id not in self.reports:
+            return 404, {'message': 'Report not found'}
+
+        elapsed = time.monotonic() - self.reports[report_id]
+        if elapsed < self.report_delay / 4:
+            return 200, {'reportId': report_id, 'executionCount': 0, 'executions': []}
+
+        process_status = 'SUCCESS' if elapsed >= self.report_delay else 'IN_PROGRESS'
+        return 200, {'reportId': report_id, 'executionCount': 1,
+                     'executions': [{'executionId': f"{report_id}-execution-1", 'processStatus': process_status, 'errors': []}]}
+
+
+    def report_file(self, query, body, report_id, execution_id):
+
+        if report_id not in self.reports:
+            return 404, {'message': 'Report not found'}
+        return 200, self.get_report_content(self.report_locations[report_id])
+
+
+    def delete_report(self, query, body, report_id):
+
+        with self.lock:
+            self.reports.pop(report_id, None)
+        return 200, {'message': 'Report deleted'}
+
+
+    def get_report_content(self, locations=()):
+        '''
+        Builds the VLAN report CSV once per location filter, with the same preamble lines DNAC
+        puts before the header. Without locations, the report covers all devices.
+        '''
+
+        with self.lock:
+            if locations not in self.report_contents:
+                report = io.StringIO()
+                report.write('VLAN\nNetwork Devices Report - VLAN\nGenerated by the stub DNA Center\n\n')
+                writer = csv.writer(report, lineterminator='\n')
+                writer.writerow(self.REPORT_COLUMNS)
+                for device in self.devices:
+                    if locations and device['locationName'] not in locations:
+                        continue
+                    for interface in synthetic_interfaces(device, self.ports_per_device):
+                        vlan_id = int(interface['vlanId'])
+                        writer.writerow([device['managementIpAddress'], device['hostname'], device['locationName'],
+                                         device['family'], device['type'], vlan_id, f"VLAN{vlan_id:04d}",
+                                         interface['portName'], interface['adminStatus'], interface['status']])
+                self.report_contents[locations] = report.getvalue()
+
+        return self.report_contents[locations]
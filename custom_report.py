@@ -16,98 +16,234 @@ or implied.
 """
 
 import pandas
-from io import StringIO
+import pathlib
 import re
+from contextlib import ExitStack
+from io import StringIO
+from interface_normalizer import InterfaceNameNormalizer
+from report_writers import create_report_writer
+from run_metrics import metrics
 
 class CustomReport():
-    
-    def __init__(self):
-        self.down_times = []
-        self.up_times = []
 
+    DNAC_REPORT_COLUMNS = 'IP Address,Device Name,Location,Device Family,Device Type,Vlan Id,Vlan Name,Interface Name,Admin Status,Operational Status'
+    DEVICE_INDEX_COLUMNS = ['IP Address', 'Interface Key', 'Uptime', 'Down Time', 'Uptime Seconds', 'Down Time Seconds']
+    CATEGORICAL_COLUMNS = ['Device Name', 'Location', 'Device Family', 'Device Type', 'Vlan Name', 'Admin Status', 'Operational Status']
+    INTEGER_COLUMNS = ['Vlan Id']
+
+    DURATION_UNITS = {'y': 31536000, 'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+    DURATION_PART_PATTERN = re.compile(r"(\d+)([ywdhms])")
+    DURATION_PATTERN = re.compile(r"^(?:\d+[ywdhms])+$")
+    CLOCK_PATTERN = re.compile(r"^(\d+):(\d\d):(\d\d)$")
+
+    def __init__(self, chunksize=100000, keep_duration_text=True, output_format='csv', output_path=None):
+        '''
+        The report columns with few distinct values are kept as categories and the Vlan Id as
+        integer. Uptime and down time are added as integer seconds. With keep_duration_text,
+        the original IOS-XE uptime and down time text is kept as well, for display.
+        The custom report is written in output_format (csv, csv.gz, csv.zst, ndjson, ndjson.gz
+        or parquet) to output_path, by default vlan_report.<format>.
+        '''
+        self.interface_normalizer = InterfaceNameNormalizer()
+        self.chunksize = chunksize
+        self.keep_duration_text = keep_duration_text
+        self.output_format = output_format
+        self.output_path = output_path
 
-    def create_custom_report(self, collected_device_data, collected_dnac_data):
+
+    def create_custom_report(self, collected_device_data, collected_dnac_data, report_consumers=()):
         '''
         Appends the uptime and down time retrieved from the device directly to the DNAC VLAN report.
+        The DNAC VLAN report can be the downloaded report content, the path of the downloaded
+        report file or the already parsed report. A report file is joined and written in chunks
+        of chunksize rows, so the memory use does not grow with the report size. Every joined
+        chunk is also passed to the report_consumers, e.g. the run of an UptimeHistory.
         '''
 
         print("Creating custom report ...")
 
-        columns = 'IP Address,Device Name,Location,Device Family,Device Type,Vlan Id,Vlan Name,Interface Name,Admin Status,Operational Status'
-        dnac_vlan_data_rows = collected_dnac_data.split(columns)[1]
+        with metrics.timer('report_device_index_seconds'):
+            device_index = self.build_device_index(collected_device_data)
+        metrics.set('report_device_index_rows', len(device_index))
+
+        with ExitStack() as stack:
+            report_writer = stack.enter_context(create_report_writer(self.output_format, self.output_path))
+            consumers = [report_writer] + [stack.enter_context(consumer) for consumer in report_consumers]
+
+            for csv_data in self.read_dnac_report_chunks(collected_dnac_data):
+                with metrics.timer('report_join_seconds'):
+                    data_frame = self.join_device_times(csv_data, device_index)
+                with metrics.timer('report_write_seconds'):
+                    for consumer in consumers:
+                        consumer.write(data_frame)
+                metrics.increment('report_rows_total', len(data_frame))
+                metrics.increment('report_chunks_total')
+
+        print(f"Custom report with the name *{report_writer.output_path}* and {report_writer.rows} rows created. Check the local demo app folder.")
+
+
+    def read_dnac_report(self, collected_dnac_data, columns=None):
+        '''
+        Parses the rows of the downloaded DNAC VLAN report content or report file into a data frame,
+        optionally only the given columns. Data that is already a data frame, e.g. from the 
+        DNACIntentCollector, is returned as is.
+        '''
+
+        if isinstance(collected_dnac_data, pandas.DataFrame):
+            csv_data = collected_dnac_data if columns is None else collected_dnac_data[columns]
+            return csv_data.astype(self.report_dtypes(csv_data.columns))
+
+        if isinstance(collected_dnac_data, pathlib.Path):
+            return pandas.concat(self.read_dnac_report_chunks(collected_dnac_data, columns), ignore_index=True)
+
+        report_columns = self.DNAC_REPORT_COLUMNS
+        dnac_vlan_data_rows = collected_dnac_data.split(report_columns)[1]
         
         csvStringIO = StringIO(dnac_vlan_data_rows)
-        csv_data = pandas.read_csv(csvStringIO, sep=",", header=None, names=columns.split(','))
-        
-        self.initialize_device_time_lists(csv_data)
 
-        for index in range(len(csv_data)):
+        try:
+            csv_data = pandas.read_csv(csvStringIO, sep=",", header=None, names=report_columns.split(','), usecols=columns,
+                                       dtype=self.report_dtypes(columns or report_columns.split(',')))
+        except pandas.errors.EmptyDataError:
+            csv_data = pandas.DataFrame(columns=columns or report_columns.split(','))
 
-            ip_address = csv_data.loc[index, 'IP Address']
-            interface_name = csv_data.loc[index,'Interface Name']
+        return csv_data
 
-            if re.findall(r"\d+(?:/\d+)+", interface_name) != []:
-                interface_abbr = interface_name[:2] + re.findall(r"\d+(?:/\d+)+", interface_name)[0]
-            elif re.findall(r"(\d+)", interface_name) != []:
-                interface_abbr = interface_name[:2] + re.findall(r"(\d+)", interface_name)[0]
-            else:
-                interface_abbr = interface_name[:2]
 
-            self.update_device_time_list_entries(collected_device_data, ip_address, interface_name, interface_abbr, index)
-        
-        csv_data['Uptime'] = self.up_times
-        csv_data['Down Time'] = self.down_times
-        
-        data_frame = pandas.DataFrame(data=csv_data)
-        data_frame.to_csv("vlan_report.csv", sep=";", header=True, index=False)
+    def read_dnac_report_chunks(self, collected_dnac_data, columns=None):
+        '''
+        Yields the rows of the DNAC VLAN report in data frames. A report file is parsed from disk
+        in chunks of chunksize rows, report content and data frames are yielded as a single chunk.
+        '''
 
-        print("Custom report with the name *vlan_report.csv* created. Check the local demo app folder.")
+        if not isinstance(collected_dnac_data, pathlib.Path):
+            yield self.read_dnac_report(collected_dnac_data, columns)
+            return
 
+        report_columns = self.DNAC_REPORT_COLUMNS.split(',')
 
-    def initialize_device_time_lists(self, csv_data):
+        with open(collected_dnac_data, 'rb') as report_file:
+            self.skip_report_preamble(report_file)
+            try:
+                reader = pandas.read_csv(report_file, sep=",", header=None, names=report_columns, usecols=columns,
+                                         dtype=self.report_dtypes(columns or report_columns),
+                                         chunksize=self.chunksize, encoding='utf-8')
+            except pandas.errors.EmptyDataError:
+                yield pandas.DataFrame(columns=columns or report_columns)
+                return
+
+            with reader:
+                for csv_data in reader:
+                    yield csv_data
+
+
+    def report_dtypes(self, columns):
         '''
-        Separate lists to store down_times and up_times of data retrieved from the device directly.
-        Each index corresponds with the associated line for the same IP and interface in the DNAC VLAN report.
+        Returns the compact dtypes of the given report columns.
         '''
-        self.down_times = [''] * len(csv_data)
-        self.up_times =  [''] * len(csv_data)
 
+        dtypes = {column: 'category' for column in self.CATEGORICAL_COLUMNS if column in columns}
+        dtypes.update({column: 'Int64' for column in self.INTEGER_COLUMNS if column in columns})
+
+        return dtypes
 
-    def update_device_time_list_entries(self, collected_device_data, ip_address, interface_name, interface_abbr, index):
+
+    def skip_report_preamble(self, report_file):
         '''
-        Takes one line of the DNAC report and checks in the device data offers down time and uptime values for the associated 
-        device IP and interface in that line. If data is available it updates the uptime and down time lists at 
-        the specific, provided index.
+        Moves the position of the binary report file to the line after the column header,
+        skipping the report title lines DNAC writes before it.
         '''
-        
+
+        header = self.DNAC_REPORT_COLUMNS.encode()
+
+        for line in iter(report_file.readline, b''):
+            if header in line:
+                return
+
+        raise ValueError(f"Column header of the DNAC VLAN report not found in {report_file.name}")
+
+
+    def get_report_targets(self, csv_data):
+        '''
+        Returns the device IPs in the DNAC VLAN report, each with the set of canonical
+        interface names the report contains for it.
+        '''
+
+        targets = pandas.DataFrame({
+            'IP Address': csv_data['IP Address'].astype(str),
+            'Interface Key': self.interface_normalizer.normalize_series(csv_data['Interface Name'].astype(str))
+        })
+
+        return {ip_address: set(interfaces) for ip_address, interfaces in targets.groupby('IP Address')['Interface Key']}
+
+
+    def build_device_index(self, collected_device_data):
+        '''
+        Flattens the data retrieved from the devices directly into one lookup table with a row per
+        device IP and interface. The table is keyed by IP and canonical interface name, so a 
+        DNAC report row can be matched with a single join instead of scanning all devices.
+        The device data can be a list or a ResultsSpool, which is read one device at a time.
+        '''
+        rows = []
+
         for device in collected_device_data:
-                if ip_address in device:
-                    interfaces = device[ip_address]['interfaces']
-                    down_time, up_time = self.get_time_or_None(interfaces, interface_name, interface_abbr) 
-                    if down_time != None:
-                        self.down_times[index] = down_time
-                    if up_time != None:
-                        self.up_times[index] = up_time
+            for ip_address, output in device.items():
+                interfaces = output.get('interfaces', {})
+                for interface, times in interfaces.items():
+                    rows.append((str(ip_address), interface, times.get('up_time'), times.get('down_time')))
+
+        device_index = pandas.DataFrame(rows, columns=['IP Address', 'Interface', 'Uptime', 'Down Time'])
+        device_index['Interface Key'] = self.interface_normalizer.normalize_series(device_index['Interface'])
+        device_index = device_index.drop_duplicates(subset=['IP Address', 'Interface Key'], keep='first')
+        device_index['Uptime Seconds'] = self.parse_durations(device_index['Uptime'])
+        device_index['Down Time Seconds'] = self.parse_durations(device_index['Down Time'])
 
+        return device_index[self.DEVICE_INDEX_COLUMNS]
 
-    def get_time_or_None(self, device_interfaces, interface_name, interface_abbr):
+
+    def join_device_times(self, csv_data, device_index):
+        '''
+        Joins the uptime and down time of the device index to the DNAC report rows with the same
+        IP and interface. Rows without device data keep empty uptime and down time values.
+        '''
+        csv_data = csv_data.assign(**{
+            'IP Address': csv_data['IP Address'].astype(str),
+            'Interface Key': self.interface_normalizer.normalize_series(csv_data['Interface Name'].astype(str))
+        })
+
+        data_frame = csv_data.merge(device_index, how='left', on=['IP Address', 'Interface Key'], sort=False)
+        data_frame = data_frame.drop(columns=['Interface Key'])
+
+        if self.keep_duration_text:
+            data_frame[['Uptime', 'Down Time']] = data_frame[['Uptime', 'Down Time']].fillna('')
+        else:
+            data_frame = data_frame.drop(columns=['Uptime', 'Down Time'])
+
+        return data_frame
+
+
+    def parse_durations(self, durations):
         '''
-        Takes interfaces dictionary (which is part of the data retrieved from the device directly) 
-        and returns the uptime and down time values for a specific interface. 
+        Converts a series of IOS-XE durations, e.g. 00:12:34, 3d04h, 2w1d or 1y12w, into integer
+        seconds. Empty or unknown values become <NA>. Each distinct value is only parsed once.
         '''
-        down_time = None
-        up_time = None
 
-        for interface in device_interfaces:
-            if interface_name == interface or interface == interface_abbr:
+        mapping = {duration: self.duration_to_seconds(duration) for duration in durations.dropna().unique()}
+
+        return durations.map(mapping).astype('Int64')
+
+
+    def duration_to_seconds(self, duration):
+
+        duration = str(duration).strip()
+        clock = self.CLOCK_PATTERN.match(duration)
+
+        if clock:
+            hours, minutes, seconds = clock.groups()
+            return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+        if self.DURATION_PATTERN.match(duration):
+            return sum(int(value) * self.DURATION_UNITS[unit] for value, unit in self.DURATION_PART_PATTERN.findall(duration))
 
-                if 'up_time' in device_interfaces[interface]:
-                    up_time = device_interfaces[interface]['up_time']
-                if 'down_time' in device_interfaces[interface]:
-                    down_time = device_interfaces[interface]['down_time']
-                break
+        return None
 
-        return down_time, up_time
-  
-            
-                  
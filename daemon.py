@@ -0,0 +1,220 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Long-running alternative to app.py, which regenerates the custom report on a schedule, e.g.:
+
+python3 daemon.py --interval 900
+"""
+
+import argparse
+import copy
+import datetime
+import signal
+import threading
+import time
+from app import collect_with_dnac_data, create_custom_report, create_dnac_collector, load_settings, release_dnac_data
+from run_metrics import metrics
+
+
+class UptimeReportDaemon():
+    '''
+    Regenerates the custom report every interval seconds from warm state. The DNAC session,
+    the loaded testbed and the device connections are kept between the refreshes: the DNAC
+    token is only renewed when it expired, the testbed is only updated from the DNAC inventory
+    every inventory_interval seconds, and the devices are polled over a DeviceConnectionPool.
+    With a testbed file, e.g. of unicon mock devices, the DNAC inventory is not used at all.
+    With a ReportService, each refreshed report is published to it as well.
+    '''
+
+    def __init__(self, settings, interval=900, inventory_interval=3600, testbed_filename=None, report_service=None):
+
+        from dnac_api import DNACenterAPI
+        from device_health import DeviceHealthCache
+        from device_pool import DeviceConnectionPool
+        from testbed_creator import TestbedCreator
+
+        self.settings = settings
+        self.interval = interval
+        self.inventory_interval = inventory_interval
+        self.static_testbed_filename = testbed_filename
+        self.report_service = report_service
+        self.testbed = None
+        self.inventory_refreshed = None
+        self.stopped = threading.Event()
+
+        self.dnac_api = DNACenterAPI(settings['dnac_username'], settings['dnac_password'], settings['dnac_base_url'],
+                                     settings['dnac_pool_size'], settings['dnac_timeout'])
+        self.dnac_collector, self.get_dnac_data = create_dnac_collector(settings, self.dnac_api)
+        self.testbed_creator = TestbedCreator(self.dnac_api, settings['testbed_filename'], settings['enable_username'],
+                                              settings['enable_password'], settings['inventory_workers'])
+        self.health_cache = DeviceHealthCache(settings['health_cache_filename'], settings['health_failure_threshold'],
+                                              settings['health_backoff'])
+        self.connection_pool = DeviceConnectionPool(settings['pool_max_connections'],
+                                                    settings['pool_idle_timeout'] or 2 * interval,
+                                                    settings['device_timeout'])
+
+
+    def run_forever(self, cycles=None):
+        '''
+        Refreshes the report until stop is called, or after the given number of cycles. A failed
+        refresh is reported and retried at the next interval. All device connections are closed
+        on the way out.
+        '''
+
+        cycle = 0
+
+        try:
+            while not self.stopped.is_set():
+                start = time.monotonic()
+
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    print(f"Exception -{e}: Refreshing the custom report failed. Retrying in {self.interval} seconds")
+
+                cycle += 1
+                if cycles is not None and cycle >= cycles:
+                    break
+
+                self.stopped.wait(max(0, self.interval - (time.monotonic() - start)))
+
+        finally:
+            self.connection_pool.close()
+
+
+    def stop(self):
+        self.stopped.set()
+
+
+    def run_cycle(self):
+        '''
+        Polls the devices while the DNAC VLAN data is retrieved, and joins both into the custom report.
+        '''
+
+        print(f"Refreshing the custom report at {datetime.datetime.now():%Y-%m-%d %H:%M:%S} ...")
+        start = time.monotonic()
+
+        collected_dnac_data, report_id = None, None
+
+        try:
+            collected_device_data, collected_dnac_data, report_id = collect_with_dnac_data(
+                self.dnac_collector, self.get_dnac_data, self.collect_device_data)
+
+            metrics.set_phase('custom report')
+
+            report_consumers = []
+            if self.report_service is not None:
+                snapshot_builder = self.report_service.snapshot_builder()
+                report_consumers.append(snapshot_builder)
+
+            create_custom_report(self.settings, collected_device_data, collected_dnac_data, report_consumers)
+
+            if self.report_service is not None:
+                self.report_service.publish(snapshot_builder)
+
+        finally:
+            release_dnac_data(self.dnac_collector, collected_dnac_data, report_id)
+
+        self.connection_pool.evict_idle()
+        self.connection_pool.print_summary()
+        metrics.finish()
+        metrics.set('connection_pool_connections', len(self.connection_pool.connections))
+        metrics.set('last_refresh_timestamp_seconds', time.time())
+        metrics.export(self.settings['metrics_json_filename'], self.settings['metrics_prometheus_filename'])
+        print(f"Refreshed the custom report in {time.monotonic() - start:.1f} seconds")
+
+
+    def collect_device_data(self, cancel_event=None):
+
+        from device_collector import DeviceCollector
+        from results_spool import ResultsSpool
+
+        metrics.set_phase('testbed')
+        self.refresh_testbed()
+        metrics.set_phase('device collection')
+        spool = ResultsSpool(self.settings['spool_filename'], keep_runs=self.settings['spool_keep_runs'])
+        device_collector = DeviceCollector(self.testbed, self.settings['command'], self.settings['max_workers'],
+                                           self.settings['device_timeout'], self.settings['device_parser'], spool,
+                                           self.health_cache, connection_pool=self.connection_pool,
+                                           cancel_event=cancel_event)
+
+        return device_collector.parse_all_devices()
+
+
+    def refresh_testbed(self):
+        '''
+        Loads the testbed in the first cycle, and updates it from the DNAC inventory every
+        inventory_interval seconds. The loaded testbed is only replaced if devices were added,
+        removed or changed, and only the connections of removed devices are closed.
+        '''
+
+        from pyats.topology import loader
+
+        if self.static_testbed_filename:
+            if self.testbed is None:
+                self.testbed = loader.load(self.static_testbed_filename)
+            return
+
+        if self.inventory_refreshed is not None and time.monotonic() - self.inventory_refreshed < self.inventory_interval:
+            return
+
+        testbed = self.testbed_creator.populate_testbed_file()
+        self.inventory_refreshed = time.monotonic()
+
+        if self.testbed is None or self.testbed_creator.testbed_changed:
+            self.testbed = loader.load(copy.deepcopy(testbed) if testbed else self.settings['testbed_filename'])
+            self.connection_pool.retain(set(self.testbed.devices))
+
+
+def parse_arguments():
+
+    parser = argparse.ArgumentParser(description="Regenerates the VLAN report with the uptime and down time per interface on a schedule.")
+    parser.add_argument('--interval', type=int, default=None,
+                        help="Seconds between the start of two refreshes. Defaults to DAEMON_INTERVAL or 900.")
+    parser.add_argument('--inventory-interval', type=int, default=None,
+                        help="Seconds between two testbed updates from the DNAC inventory. Defaults to INVENTORY_INTERVAL or 3600.")
+    parser.add_argument('--testbed', default=None,
+                        help="Poll the devices of this testbed file, e.g. unicon mock devices, instead of the DNAC inventory.")
+    parser.add_argument('--cycles', type=int, default=None,
+                        help="Stop after this number of refreshes.")
+    parser.add_argument('--serve-port', type=int, default=None,
+                        help="Serve the latest report read-only over HTTP on this port.")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = parse_arguments()
+    settings = load_settings()
+    report_service = None
+
+    if args.serve_port is not None:
+        from report_service import ReportService
+        report_service = ReportService(settings['service_host'], args.serve_port).start()
+
+    daemon = UptimeReportDaemon(settings, args.interval or settings['daemon_interval'],
+                                args.inventory_interval or settings['inventory_interval'], args.testbed, report_service)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+
+    try:
+        daemon.run_forever(args.cycles)
+    except KeyboardInterrupt:
+        print("Stopped")
+    finally:
+        if report_service is not None:
+            report_service.stop()
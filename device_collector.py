@@ -15,48 +15,238 @@ IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 or implied.
 """
 
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from interface_link_parser import InterfaceLinkParser
+from interface_normalizer import InterfaceNameNormalizer
+from run_metrics import metrics
+
+
 class DeviceCollector:
-    
-    def __init__(self, testbed_filename, command):
-        
-        from pyats.topology import loader
-        
+
+    def __init__(self, testbed, command, max_workers=1, device_timeout=60, parser='genie', spool=None, health_cache=None,
+                 target_interfaces=None, connection_pool=None, cancel_event=None):
+        '''
+        The testbed can be the name of a testbed file, a testbed dictionary or an already
+        loaded pyATS testbed. With parser='fast', the output of "show interfaces link" is
+        parsed by the lightweight InterfaceLinkParser and only handed to Genie if it contains
+        lines the fast parser does not recognize. With a ResultsSpool, each result is written 
+        to the spool as soon as the device was polled, and devices already in the spool are skipped.
+        With a DeviceHealthCache, devices in backoff after repeated failures are skipped.
+        With target_interfaces, a dictionary of device IP to canonical interface names, only
+        these interfaces are kept from the parsed output. With a DeviceConnectionPool, the
+        command is executed on the pooled connection of the device, which stays open afterwards.
+        Once cancel_event is set, e.g. because the DNAC report failed, the remaining devices are
+        skipped without counting them as failures.
+        '''
+
         self.command = command
-        self.testbed = loader.load(testbed_filename)
-  
-  
+        self.testbed = self.load_testbed(testbed)
+        self.max_workers = max(1, int(max_workers))
+        self.device_timeout = device_timeout
+        self.fast_parser = InterfaceLinkParser() if parser == 'fast' and command == 'show interfaces link' else None
+        self.spool = spool
+        self.health_cache = health_cache
+        self.target_interfaces = target_interfaces
+        self.connection_pool = connection_pool
+        self.cancel_event = cancel_event
+        self.cancelled_devices = set()
+        self.interface_normalizer = InterfaceNameNormalizer()
+
+
+    @staticmethod
+    def load_testbed(testbed):
+
+        if hasattr(testbed, 'devices'):
+            return testbed
+
+        from pyats.topology import loader
+
+        if isinstance(testbed, dict):
+            testbed = copy.deepcopy(testbed)
+
+        return loader.load(testbed)
+
+
     def parse_all_devices(self):
         '''
-        Connects to each device from the testbed directly and execute the command provided 
+        Connects to each device from the testbed directly and execute the command provided
         at initialisation. Returns json response for CLI output.
+        Devices are polled by a pool of up to max_workers threads. The results are returned
+        in testbed order, regardless of the order in which the devices finished.
+        With a spool, the spool is returned instead. It yields the results of the current run
+        in the order the devices finished, without holding all of them in memory.
         '''
 
-        print("Retrieving data from devices directly via pyATS...")
+        print(f"Retrieving data from devices directly via pyATS with {self.max_workers} worker(s)...")
+
+        devices = list(self.testbed.devices.values())
+
+        if self.spool is not None:
+            completed_devices = self.spool.completed_devices()
+            if completed_devices:
+                print(f"Resuming run {self.spool.run_id}: skipping {len(completed_devices)} devices already in the spool")
+                resumed_devices = [device for device in devices if device.name not in completed_devices]
+                metrics.increment('devices_skipped_total', len(devices) - len(resumed_devices), reason='resumed')
+                devices = resumed_devices
+
+        skipped_devices = []
+        if self.health_cache is not None:
+            skipped_devices = [device for device in devices if not self.health_cache.should_attempt(device.name)]
+            devices = [device for device in devices if self.health_cache.should_attempt(device.name)]
+            metrics.increment('devices_skipped_total', len(skipped_devices), reason='backoff')
+
+        if self.max_workers == 1:
+            results = [self.collect_device(device) for device in devices]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self.collect_device, devices))
 
         output_all_devices = []
         failed_devices = []
 
-        for device in self.testbed.devices.values():
+        for device, result in zip(devices, results):
+            if result is None and device.name in self.cancelled_devices:
+                continue
+            if result is None:
+                failed_devices.append(device)
+            elif self.spool is None:
+                output_all_devices.append(result)
 
-            try:
-                print(f"Executing command: {self.command} for device :{device.name} ...")
-                device.connect(init_exec_commands=[], init_config_commands=[], learn_hostname=True, log_stdout=False)
-                output = device.parse(self.command)
-                output_all_devices.append({str(device.connections.cli.ip) : output})
+        if self.spool is not None:
+            self.spool.close()
+            output_all_devices = self.spool
 
-            except Exception as e:
-                print(f"Exception -{e}: Execution of command: {self.command} for device: {device.name} failed")
-                failed_devices.append(device)
+        if self.health_cache is not None:
+            self.health_cache.save()
+            if skipped_devices:
+                print("Summary: Skipped the following devices, which are in backoff after repeated failures:")
+                print(skipped_devices)
+            self.health_cache.print_summary()
 
-            device.disconnect()
+        metrics.increment('devices_skipped_total', len(self.cancelled_devices), reason='cancelled')
 
         if failed_devices:
             print("Summary: Execution for the following devices failed:")
             print(failed_devices)
 
-        else:
+        if self.cancelled_devices:
+            print(f"Summary: The collection was cancelled, {len(self.cancelled_devices)} devices were not polled")
+
+        if not failed_devices and not self.cancelled_devices:
             print(f"Summary: All devices were parsed successfully for command: {self.command}")
-            print(output_all_devices)
-            
+            if self.spool is not None:
+                print(f"Results of run {self.spool.run_id} were written to {self.spool.spool_filename}")
+            else:
+                print(output_all_devices)
+
         return output_all_devices
-        
\ No newline at end of file
+
+
+    def collect_device(self, device):
+        '''
+        Polls a single device and writes the result to the spool, if there is one.
+        Returns None if the device failed or the collection was cancelled.
+        '''
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.cancelled_devices.add(device.name)
+            return None
+
+        with metrics.timer('device_poll_seconds'):
+            result = self.parse_device(device)
+
+        metrics.increment('devices_polled_total', result='failure' if result is None else 'success')
+
+        if result is not None and self.spool is not None:
+            self.spool.append(device.name, result)
+            return device.name
+
+        return result
+
+
+    def parse_device(self, device):
+        '''
+        Connects to a single device, executes and parses the command and disconnects again.
+        Returns {device ip: parsed output} or None if the execution failed. Connecting and
+        executing the command are each bound by device_timeout seconds. The health cache only
+        tracks whether the device was reachable: a failed connect or execution counts as failure,
+        an output that failed to parse does not.
+        '''
+
+        try:
+            print(f"Executing command: {self.command} for device :{device.name} ...")
+            raw_output = self.execute_command(device)
+
+        except Exception as e:
+            print(f"Exception -{e}: Execution of command: {self.command} for device: {device.name} failed")
+            if self.health_cache is not None:
+                self.health_cache.record_failure(device.name, str(device.connections.cli.ip), f"{type(e).__name__}: {e}")
+            return None
+
+        if self.health_cache is not None:
+            self.health_cache.record_success(device.name, str(device.connections.cli.ip))
+
+        try:
+            output = self.parse_output(device, raw_output)
+            ip_address = str(device.connections.cli.ip)
+            if self.target_interfaces is not None:
+                output = self.filter_interfaces(output, self.target_interfaces.get(ip_address, set()))
+
+        except Exception as e:
+            print(f"Exception -{e}: Parsing the output of command: {self.command} for device: {device.name} failed")
+            metrics.increment('device_parse_failures_total')
+            return None
+
+        return {ip_address : output}
+
+
+    def execute_command(self, device):
+        '''
+        Returns the raw output of the command, executed on the pooled connection if there is a
+        connection pool, otherwise on a new connection that is closed again afterwards.
+        '''
+
+        if self.connection_pool is not None:
+            return self.connection_pool.execute(device, self.command, self.device_timeout)
+
+        try:
+            with metrics.timer('device_connect_seconds'):
+                device.connect(init_exec_commands=[], init_config_commands=[], learn_hostname=True, log_stdout=False,
+                               connection_timeout=self.device_timeout)
+            with metrics.timer('device_execute_seconds'):
+                return device.execute(self.command, timeout=self.device_timeout)
+
+        finally:
+            try:
+                device.disconnect()
+            except Exception as e:
+                print(f"Exception -{e}: Disconnecting from device: {device.name} failed")
+
+
+    def parse_output(self, device, raw_output):
+        '''
+        Parses the raw command output with the fast parser if enabled, otherwise or if the
+        fast parser does not recognize the output with Genie.
+        '''
+
+        if self.fast_parser is not None:
+            with metrics.timer('device_parse_seconds', parser='fast'):
+                output = self.fast_parser.parse(raw_output)
+            if output is not None:
+                return output
+            print(f"Unrecognized output of {self.command} for device: {device.name}. Falling back to Genie parser ...")
+            metrics.increment('device_parser_fallbacks_total')
+
+        with metrics.timer('device_parse_seconds', parser='genie'):
+            return device.parse(self.command, output=raw_output)
+
+
+    def filter_interfaces(self, output, interface_names):
+        '''
+        Keeps only the interfaces of the parsed output whose canonical name is in interface_names.
+        '''
+
+        interfaces = output.get('interfaces', {})
+        return {'interfaces': {interface: values for interface, values in interfaces.items()
+                               if self.interface_normalizer.normalize(interface) in interface_names}}
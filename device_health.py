@@ -0,0 +1,130 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+
+
+class DeviceHealthCache():
+    '''
+    Persisted reachability of the devices across runs. A device that failed in failure_threshold
+    consecutive runs is only retried after a backoff, which starts at backoff seconds and doubles
+    with every further failure up to max_backoff seconds. Per device it stores:
+
+    {"ip": "...", "consecutive_failures": 2, "last_failure": ..., "last_failure_reason": "...",
+     "last_success": ..., "next_attempt": ...}
+    '''
+
+    def __init__(self, cache_filename, failure_threshold=2, backoff=900, max_backoff=86400):
+
+        self.cache_filename = cache_filename
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.devices = self.load()
+
+
+    def should_attempt(self, device_name):
+        '''
+        Returns False while the device is in backoff after repeated failures.
+        '''
+
+        entry = self.devices.get(device_name)
+        return entry is None or entry.get('next_attempt') is None or time.time() >= entry['next_attempt']
+
+
+    def record_success(self, device_name, ip):
+
+        with self.lock:
+            entry = self.devices.setdefault(device_name, {})
+            entry.update({'ip': ip, 'consecutive_failures': 0, 'last_success': time.time(), 'next_attempt': None})
+
+
+    def record_failure(self, device_name, ip, reason):
+
+        with self.lock:
+            entry = self.devices.setdefault(device_name, {'last_success': None})
+            failures = entry.get('consecutive_failures', 0) + 1
+            now = time.time()
+            next_attempt = None
+
+            if failures >= self.failure_threshold:
+                next_attempt = now + min(self.backoff * 2 ** (failures - self.failure_threshold), self.max_backoff)
+
+            entry.update({'ip': ip, 'consecutive_failures': failures, 'last_failure': now,
+                          'last_failure_reason': reason, 'next_attempt': next_attempt})
+
+
+    def clear(self):
+
+        with self.lock:
+            self.devices = {}
+        if os.path.exists(self.cache_filename):
+            os.remove(self.cache_filename)
+        print(f"Cleared device health cache {self.cache_filename}")
+
+
+    def print_summary(self):
+        '''
+        Prints the devices with failures and when they are retried next.
+        '''
+
+        unhealthy_devices = {name: entry for name, entry in self.devices.items() if entry.get('consecutive_failures')}
+
+        if not unhealthy_devices:
+            print("Device health: all known devices were reachable in their last attempt")
+            return
+
+        print(f"Device health: {len(unhealthy_devices)} device(s) failed in their last attempt:")
+        for name, entry in sorted(unhealthy_devices.items()):
+            print(f"  {name} ({entry['ip']}): {entry['consecutive_failures']} consecutive failure(s), "
+                  f"last success: {self.format_time(entry.get('last_success'))}, "
+                  f"next attempt: {self.format_time(entry.get('next_attempt')) if entry.get('next_attempt') else 'next run'}, "
+                  f"reason: {entry['last_failure_reason']}")
+
+
+    def format_time(self, timestamp):
+
+        if timestamp is None:
+            return 'never'
+        return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+    def load(self):
+
+        if not os.path.exists(self.cache_filename):
+            return {}
+
+        try:
+            with open(self.cache_filename) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable device health cache {self.cache_filename}: {e}")
+            return {}
+
+
+    def save(self):
+
+        with self.lock:
+            temporary_filename = self.cache_filename + '.tmp'
+            with open(temporary_filename, 'w') as cache_file:
+                json.dump(self.devices, cache_file, indent=2)
+            os.replace(temporary_filename, self.cache_filename)
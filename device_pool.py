@@ -0,0 +1,210 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from run_metrics import metrics
+
+
+class DeviceConnectionPool():
+    '''
+    Keeps the pyATS connections of up to max_connections devices open between polls, so a
+    long-running process does not log in to every device for every refresh. Once the pool is
+    full, its devices stay pooled and further devices are connected and disconnected for each
+    poll, since evicting pooled connections for them would, with the same polling order every
+    cycle, close every connection before it is used again. Connections unused for idle_timeout
+    seconds are closed by evict_idle, which frees their slots. A connection that fails while
+    executing a command is closed and opened again once, before the failure is reported.
+    '''
+
+    def __init__(self, max_connections=100, idle_timeout=1800, device_timeout=60):
+
+        self.max_connections = max(1, int(max_connections))
+        self.idle_timeout = idle_timeout
+        self.device_timeout = device_timeout
+        self.lock = threading.Lock()
+        self.connections = OrderedDict()
+        self.in_use = set()
+        self.connects = 0
+        self.reuses = 0
+        self.unpooled_connects = 0
+
+
+    def execute(self, device, command, timeout):
+        '''
+        Executes the command on a pooled connection of the device, reconnecting once if the
+        connection turns out to be broken.
+        '''
+
+        for attempt in range(2):
+            pooled_device = self.acquire(device)
+            try:
+                with metrics.timer('device_execute_seconds'):
+                    output = pooled_device.execute(command, timeout=timeout)
+            except Exception as e:
+                metrics.increment('device_pool_reconnects_total' if attempt == 0 else 'device_pool_failures_total')
+                self.discard(pooled_device)
+                if attempt == 1:
+                    raise
+                print(f"Exception -{e}: Pooled connection to device: {device.name} failed. Reconnecting ...")
+                continue
+
+            self.release(pooled_device)
+            return output
+
+
+    def acquire(self, device):
+        '''
+        Returns the connected device object of the pool for this device, or connects the device.
+        A newly connected device is added to the pool if it is not full.
+        '''
+
+        key = self.connection_key(device)
+
+        with self.lock:
+            pooled_device = self.connections.get(key, (None, None))[0]
+            self.in_use.add(key)
+
+        if pooled_device is not None and pooled_device.is_connected():
+            with self.lock:
+                self.connections.move_to_end(key)
+                self.reuses += 1
+            metrics.increment('device_pool_reuses_total')
+            return pooled_device
+
+        if pooled_device is not None:
+            self.disconnect([pooled_device])
+
+        try:
+            with metrics.timer('device_connect_seconds'):
+                device.connect(init_exec_commands=[], init_config_commands=[], learn_hostname=True, log_stdout=False,
+                               connection_timeout=self.device_timeout)
+        except Exception:
+            with self.lock:
+                self.in_use.discard(key)
+            raise
+
+        with self.lock:
+            self.connects += 1
+            if key in self.connections or len(self.connections) < self.max_connections:
+                self.connections[key] = (device, time.monotonic())
+            else:
+                self.unpooled_connects += 1
+
+        return device
+
+
+    def release(self, device):
+        '''
+        Returns the connection to the pool, or closes it if the device is not pooled.
+        '''
+
+        key = self.connection_key(device)
+
+        with self.lock:
+            self.in_use.discard(key)
+            pooled = key in self.connections
+            if pooled:
+                self.connections[key] = (device, time.monotonic())
+
+        if not pooled:
+            self.disconnect([device])
+
+
+    def discard(self, device):
+
+        key = self.connection_key(device)
+
+        with self.lock:
+            self.in_use.discard(key)
+            self.connections.pop(key, None)
+
+        self.disconnect([device])
+
+
+    def evict_idle(self):
+        '''
+        Closes the connections that were not used for idle_timeout seconds.
+        '''
+
+        now = time.monotonic()
+
+        with self.lock:
+            evicted = self.pop_connections(len(self.connections), lambda last_used: now - last_used >= self.idle_timeout)
+
+        self.disconnect(evicted)
+        if evicted:
+            print(f"Closed {len(evicted)} idle device connection(s)")
+
+
+    def retain(self, device_names):
+        '''
+        Closes the connections of devices that are no longer in the testbed.
+        '''
+
+        with self.lock:
+            keys = [key for key in self.connections if key[0] not in device_names and key not in self.in_use]
+            evicted = [self.connections.pop(key)[0] for key in keys]
+
+        self.disconnect(evicted)
+
+
+    def close(self):
+
+        with self.lock:
+            evicted = [device for device, last_used in self.connections.values()]
+            self.connections.clear()
+
+        self.disconnect(evicted)
+
+
+    def print_summary(self):
+        print(f"Device connection pool: {len(self.connections)} open connection(s), "
+              f"{self.connects} connect(s), {self.reuses} reuse(s), "
+              f"{self.unpooled_connects} connect(s) beyond POOL_MAX_CONNECTIONS")
+
+
+    def pop_connections(self, count, should_evict):
+        '''
+        Removes up to count connections that are not in use and for which should_evict(last used)
+        is true, least recently used first. Must be called with the lock held.
+        '''
+
+        evicted = []
+
+        for key, (device, last_used) in list(self.connections.items()):
+            if len(evicted) >= count:
+                break
+            if key not in self.in_use and should_evict(last_used):
+                del self.connections[key]
+                evicted.append(device)
+
+        return evicted
+
+
+    def disconnect(self, devices):
+
+        for device in devices:
+            try:
+                device.disconnect()
+            except Exception as e:
+                print(f"Exception -{e}: Disconnecting from device: {device.name} failed")
+
+
+    def connection_key(self, device):
+        return (device.name, str(device.connections.cli.ip))
@@ -16,21 +16,124 @@ or implied.
 """
 
 from requests.auth import HTTPBasicAuth 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import re
 import requests
 import sys
+import threading
+import time
 import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from run_metrics import metrics
 urllib3.disable_warnings()
 
+
+class TooManyRequestsRetry(Retry):
+    '''
+    Retry that also retries non-idempotent requests, e.g. POST, if they were answered with
+    429 Too Many Requests, since DNA Center did not process them. Other statuses are only
+    retried for the idempotent methods.
+    '''
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+
+        if status_code == requests.codes.too_many_requests and status_code in (self.status_forcelist or ()):
+            return True
+
+        return super().is_retry(method, status_code, has_retry_after)
+
+
 class DNACenterAPI():
 
-    def __init__(self, username, password, base_url):
+    RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+    INVENTORY_DEVICE_TYPES = "Cisco Catalyst 9500 Switch&type=Cisco Catalyst 9200L Switch&type=Cisco Catalyst 9300 Switch"
+    INVENTORY_PAGE_SIZE = 500
+    ID_SEGMENT_PATTERN = re.compile(r"/(?=[0-9a-fA-F-]*\d)[0-9a-fA-F-]{8,}(?=/|$)")
+
+    def __init__(self, username, password, base_url, pool_size=10, timeout=30, max_retries=5, backoff_factor=1):
 
         self.base_url = base_url
         self.auth = HTTPBasicAuth(username, password)
+        self.timeout = timeout
+        self.session = self.create_session(pool_size, max_retries, backoff_factor)
+        self.token_lock = threading.Lock()
         self.token = self.get_dnac_jwt_token()
         self.headers = {'Content-Type': 'application/json', 'X-Auth-Token': self.token}
 
 
+    def create_session(self, pool_size, max_retries, backoff_factor):
+        '''
+        Creates a keep-alive session with a connection pool of pool_size connections to DNA Center. 
+        Idempotent requests answered with 429 or 5xx and all requests answered with 429, including
+        the authentication and report scheduling POSTs, are retried with exponential backoff,
+        honoring the Retry-After header.
+        '''
+
+        retry = TooManyRequestsRetry(total=max_retries, backoff_factor=backoff_factor, status_forcelist=self.RETRY_STATUS_CODES,
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.verify = False
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        return session
+
+
+    def request(self, method, url, **kwargs):
+        '''
+        Sends a request with the current token via the pooled session. If DNA Center rejects the
+        token, because it expired during a long run, a new token is retrieved and the request is
+        sent once more. Every request is counted and timed in the run metrics.
+        '''
+
+        headers = self.headers
+        response = self.send_request(method, url, headers, **kwargs)
+
+        if response.status_code == requests.codes.unauthorized:
+            metrics.increment('dnac_reauthentications_total')
+            self.refresh_token(headers['X-Auth-Token'])
+            response = self.send_request(method, url, self.headers, **kwargs)
+
+        return response
+
+
+    def send_request(self, method, url, headers, **kwargs):
+
+        endpoint = self.ID_SEGMENT_PATTERN.sub('/{id}', urlparse(url).path)
+        start = time.perf_counter()
+
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+        except Exception:
+            metrics.increment('dnac_requests_total', method=method, endpoint=endpoint, status='error')
+            raise
+
+        metrics.observe('dnac_request_seconds', time.perf_counter() - start, method=method, endpoint=endpoint)
+        metrics.increment('dnac_requests_total', method=method, endpoint=endpoint, status=response.status_code)
+
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            metrics.increment('dnac_request_retries_total', len(retries.history), method=method, endpoint=endpoint)
+
+        return response
+
+
+    def refresh_token(self, expired_token):
+        '''
+        Retrieves a new token, unless another thread already replaced the expired one.
+        '''
+
+        with self.token_lock:
+            if self.token == expired_token:
+                print("DNAC token expired. Re-authenticating ...")
+                self.token = self.get_dnac_jwt_token()
+                self.headers = {'Content-Type': 'application/json', 'X-Auth-Token': self.token}
+
+
     def get_dnac_jwt_token(self):
         '''
         Retieve token for authentication with DNA Center. Used in concurring API calls.
@@ -40,7 +143,8 @@ class DNACenterAPI():
 
         url = self.base_url + '/dna/system/api/v1/auth/token'
         header = {'content-type': 'application/json'}
-        response = requests.post(url, auth=self.auth, headers=header, verify=False)
+        with metrics.timer('dnac_auth_seconds'):
+            response = self.session.post(url, auth=self.auth, headers=header, timeout=self.timeout)
 
         if(response.status_code == requests.codes.ok):
             dnac_jwt_token = response.json()['Token']
@@ -58,7 +162,7 @@ class DNACenterAPI():
         Returns the report view groups.
         '''
         url = self.base_url + '/dna/intent/api/v1/data/view-groups'
-        response = requests.get(url, headers=self.headers, verify=False)
+        response = self.request("GET", url)
         report_view_groups = response.json()
         return report_view_groups
 
@@ -68,7 +172,7 @@ class DNACenterAPI():
         Returns the views for the groups id {view_group_id}.
         '''
         url = self.base_url + '/dna/intent/api/v1/data/view-groups/' + view_group_id
-        response = requests.get(url, headers=self.headers, verify=False)
+        response = self.request("GET", url)
         report_view_ids = response.json()
         return report_view_ids
 
@@ -80,7 +184,7 @@ class DNACenterAPI():
         
         url = self.base_url + "/dna/intent/api/v1/data/reports"
         payload = report_definition
-        response = requests.request("POST", url, headers=self.headers, data=payload, verify=False)
+        response = self.request("POST", url, data=payload)
 
         return response
 
@@ -91,7 +195,7 @@ class DNACenterAPI():
         '''
 
         url = self.base_url + '/dna/intent/api/v1/data/reports/' + report_id + '/executions'
-        response = requests.get(url, headers=self.headers, verify=False)
+        response = self.request("GET", url)
 
         return response.json()
 
@@ -102,11 +206,30 @@ class DNACenterAPI():
         '''
 
         url = self.base_url + '/dna/intent/api/v1/data/reports/' + report_id + '/executions/' + execution_id
-        response = requests.get(url, headers=self.headers, verify=False)
+        response = self.request("GET", url)
         
         return response.text
 
 
+    def download_report_file(self, report_id, execution_id, filename, chunk_size=1048576):
+        '''
+        Writes the report content to {filename} while it is downloaded, without holding the
+        whole report in memory. Returns the number of bytes written.
+        '''
+
+        url = self.base_url + '/dna/intent/api/v1/data/reports/' + report_id + '/executions/' + execution_id
+        size = 0
+
+        with self.request("GET", url, stream=True) as response:
+            response.raise_for_status()
+            with open(filename, 'wb') as report_file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    report_file.write(chunk)
+                    size += len(chunk)
+
+        return size
+
+
     def delete_report(self, report_id):
         '''
         Deletes a schedule report.
@@ -115,7 +238,7 @@ class DNACenterAPI():
         print('Deleting report in DNA Center after successfully retrieving the associated data...')
         
         url = self.base_url + '/dna/intent/api/v1/data/reports/' + report_id
-        operation_result = requests.delete(url, headers=self.headers, verify=False)
+        operation_result = self.request("DELETE", url)
         
         return operation_result
 
@@ -126,10 +249,133 @@ class DNACenterAPI():
         
         url = self.base_url + '/dna/intent/api/v1/network-device' + filter
         print(url)
-        response = requests.get(url, headers=self.headers, verify=False)
+        response = self.request("GET", url)
 
         return response.json()
 
 
+    def get_device_count(self, filter=""):
+        '''
+        Returns the number of DNAC inventory devices matching the filter.
+        '''
+
+        url = self.base_url + '/dna/intent/api/v1/network-device/count' + filter
+        response = self.request("GET", url)
+
+        return response.json()['response']
+
+
+    def get_inventory_devices(self, max_workers=1):
+        '''
+        Returns all inventory devices of the type Cisco Catalyst 9500 Switch, Cisco Catalyst
+        9200L Switch and Cisco Catalyst 9300 Switch. With more than one worker, the number of
+        devices is retrieved first and the pages are fetched with up to max_workers requests.
+        '''
+
+        if max_workers > 1:
+            try:
+                device_count = self.get_device_count(filter=f"?type={self.INVENTORY_DEVICE_TYPES}")
+            except Exception as e:
+                print(f"Exception -{e}: Retrieving the inventory device count failed. Fetching pages one after another ...")
+            else:
+                return self.get_inventory_devices_concurrently(device_count, max_workers)
+
+        return self.get_inventory_devices_serially(offset=1)
+
+
+    def get_inventory_devices_serially(self, offset):
+        '''
+        Fetches one page after another, starting at offset, until a page is not full.
+        '''
+
+        all_inventory_devices_list = []
+        inventory_devices = self.get_inventory_page(offset)
+        all_inventory_devices_list.extend(inventory_devices)
+
+        while len(inventory_devices) == self.INVENTORY_PAGE_SIZE:
+            offset = offset + self.INVENTORY_PAGE_SIZE
+            inventory_devices = self.get_inventory_page(offset)
+            all_inventory_devices_list.extend(inventory_devices)
+
+        return all_inventory_devices_list
+
+
+    def get_inventory_devices_concurrently(self, device_count, max_workers):
+        '''
+        Fetches all pages for device_count devices with up to max_workers requests in flight
+        and merges them in offset order. Devices added after counting are fetched serially.
+        '''
+
+        offsets = list(range(1, device_count + 1, self.INVENTORY_PAGE_SIZE)) or [1]
+        print(f"Retrieving {device_count} inventory devices in {len(offsets)} pages with {max_workers} workers ...")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages = list(executor.map(self.get_inventory_page, offsets))
+
+        all_inventory_devices_list = []
+        for page in pages:
+            all_inventory_devices_list.extend(page)
+
+        if len(pages[-1]) == self.INVENTORY_PAGE_SIZE:
+            all_inventory_devices_list.extend(self.get_inventory_devices_serially(offsets[-1] + self.INVENTORY_PAGE_SIZE))
+
+        return all_inventory_devices_list
+
+
+    def get_inventory_page(self, offset):
+
+        filter = f"?type={self.INVENTORY_DEVICE_TYPES}&offset={offset}&limit={self.INVENTORY_PAGE_SIZE}"
+
+        with metrics.timer('inventory_page_seconds'):
+            inventory_devices = self.get_device_list(filter=filter)['response']
+
+        metrics.increment('inventory_devices_total', len(inventory_devices))
+        return inventory_devices
+
+
+    def get_device_interfaces(self, device_id):
+        '''
+        Returns the interfaces of the inventory device with the id {device_id}.
+        '''
+
+        url = self.base_url + '/dna/intent/api/v1/interface/network-device/' + device_id
+        response = self.request("GET", url)
+        response.raise_for_status()
+
+        return response.json()['response']
+
+
+    def get_device_vlans(self, device_id):
+        '''
+        Returns the VLANs of the inventory device with the id {device_id}.
+        '''
+
+        url = self.base_url + '/dna/intent/api/v1/network-device/' + device_id + '/vlan'
+        response = self.request("GET", url)
+
+        if response.status_code == requests.codes.no_content:
+            return []
+        response.raise_for_status()
+
+        return response.json()['response']
+
+
+    def get_sites(self, site_type=None):
+        '''
+        Returns all sites of the DNAC site hierarchy, optionally only those of the type {site_type}
+        (area, building or floor).
+        '''
+
+        limit = 500
+        offset = 1
+        all_sites = []
 
+        while True:
+            filter = f"?offset={offset}&limit={limit}" + (f"&type={site_type}" if site_type else "")
+            url = self.base_url + '/dna/intent/api/v1/site' + filter
+            sites = self.request("GET", url).json()['response']
+            all_sites.extend(sites)
 
+            if len(sites) < limit:
+                return all_sites
+            offset = offset + limit
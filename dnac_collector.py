@@ -15,20 +15,49 @@ IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 or implied.
 '''
  
+import os
+import pathlib
 import requests
 import sys
 import time
 import json
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from run_metrics import metrics
+
+
+class ReportExecutionError(Exception):
+    '''
+    Raised if a DNA Center report execution failed, was cancelled or did not complete in time.
+    '''
+
+
+class ReportCancelledError(Exception):
+    '''
+    Raised if a DNA Center report was cancelled by the run, e.g. because the device collection failed.
+    '''
 
 
 class DNACCollector:
 
-    def __init__(self, dnac_api):
+    FAILED_PROCESS_STATUSES = ['FAILED', 'CANCELLED', 'CANCELED', 'ERROR']
+    # Statuses of a report rejected for its view ids, after which the cached view ids are refreshed
+    STALE_VIEW_STATUS_CODES = [400, 404]
+
+    def __init__(self, dnac_api, report_deadline=1800, poll_interval=0.5, max_poll_interval=30, poll_backoff=1.5, view_cache=None,
+                 download_folder=None, inventory_workers=1):
 
         self.dnac_api = dnac_api
+        self.inventory_workers = inventory_workers
+        self.view_cache = view_cache
+        self.download_folder = download_folder
         self.REPORT_CATEGORY = 'Network Devices'
         self.VIEW_NAME = 'VLAN'
+        self.report_deadline = report_deadline
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_backoff = poll_backoff
+        self.report_metrics = {}
 
 
     def get_report_view_group_id(self, report_category):
@@ -56,15 +85,42 @@ class DNACCollector:
         return report_view_id
     
 
-    def generate_VLAN_report(self, view_group_id, report_view_id):
+    def get_report_view_ids(self):
+        '''
+        Returns the view group id and report view id for the VLAN report and whether they were
+        taken from the view cache. Without a cached entry, the ids are looked up in DNA Center.
+        '''
+
+        if self.view_cache is not None:
+            cached_ids = self.view_cache.get(self.REPORT_CATEGORY, self.VIEW_NAME)
+            if cached_ids is not None:
+                print('Using cached view group and report view id for ' + self.REPORT_CATEGORY + ' and ' + self.VIEW_NAME)
+                return cached_ids[0], cached_ids[1], True
+
+        print('Retrieving view group and report view id for ' +self.REPORT_CATEGORY + ' and ' + self.VIEW_NAME + '...')
+
+        view_group_id = self.get_report_view_group_id (report_category=self.REPORT_CATEGORY)
+        report_view_id = self.get_report_view_id_by_name (view_name=self.VIEW_NAME, view_group_id=view_group_id)
+
+        return view_group_id, report_view_id, False
+
+
+    def generate_VLAN_report(self, view_group_id, report_view_id, location=None):
         '''
         Defines the report definition and triggers the creation of a latest DNA Center VLAN report.
+        With a location (a site of the DNAC site API), the report only covers that site.
         '''
 
         current_time = str(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        location_name = ''
+        location_filter_value = []
+
+        if location is not None:
+            location_name = " - " + location['siteNameHierarchy']
+            location_filter_value = [{"value": location['id'], "displayValue": location['siteNameHierarchy']}]
 
         report_definition = json.dumps({
-            "name": self.REPORT_CATEGORY + "Report - " + self.VIEW_NAME +" - " + str(current_time),
+            "name": self.REPORT_CATEGORY + "Report - " + self.VIEW_NAME + location_name + " - " + str(current_time),
             "dataCategory": self.REPORT_CATEGORY,
             "tags": [],
             "viewGroupId": view_group_id,
@@ -135,7 +191,7 @@ class DNACCollector:
                     "type": "MULTI_SELECT_TREE",
                     "scope": "",
                     "filterSpecId": "",
-                    "value": []
+                    "value": location_filter_value
                 },
                 {
                     "type": "REGULAR",
@@ -187,53 +243,261 @@ class DNACCollector:
         return response
 
 
-    def get_custom_VLAN_report(self):
+    def get_custom_VLAN_report(self, cancel_event=None):
         '''
         Triggers the creation of a latest DNA Center VLAN report, waits for the report to be 
-        available and returns the report data.
+        available and returns the report data. Setting cancel_event stops the wait and deletes
+        the report.
         '''
-        print('Retrieving view group and report view id for ' +self.REPORT_CATEGORY + ' and ' + self.VIEW_NAME + '...')
 
-        view_group_id = self.get_report_view_group_id (report_category=self.REPORT_CATEGORY)
-        report_view_id = self.get_report_view_id_by_name (view_name=self.VIEW_NAME, view_group_id=view_group_id)
+        try:
+            return self.run_VLAN_report(cancel_event=cancel_event)
+        except ReportExecutionError as e:
+            print(f'\n {e}')
+            sys.exit(1)
+
+
+    def get_sharded_VLAN_report(self, read_report, max_workers=4, retries=2, cancel_event=None):
+        '''
+        Splits the VLAN report by building: one report per building of the DNAC site hierarchy
+        is scheduled, awaited, downloaded and deleted, with up to max_workers reports at the same
+        time. Each report is parsed into a data frame with read_report, e.g. CustomReport.read_dnac_report.
+        A failed building report is retried up to retries times on its own. Returns the merged
+        report rows as data frame. The reports are already deleted, so no report id is returned.
+        Inventory switches that are in no building report, e.g. devices not assigned to a
+        building, are listed in a warning. Setting cancel_event stops all building reports
+        without retrying them.
+        '''
+
+        import pandas
+
+        buildings = self.dnac_api.get_sites(site_type='building')
+
+        if not buildings:
+            print('No buildings found in the DNAC site hierarchy. Retrieving a single VLAN report ...')
+            report_content, report_id = self.get_custom_VLAN_report(cancel_event)
+            try:
+                return read_report(report_content), None
+            finally:
+                self.discard_report(report_id, report_content)
+
+        print(f'Retrieving {len(buildings)} VLAN reports, one per building, with {max_workers} workers ...')
+
+        # The view ids are resolved and cached once, instead of by every building report at the same time
+        view_ids = self.get_report_view_ids()
+        if self.view_cache is not None and not view_ids[2]:
+            self.view_cache.set(self.REPORT_CATEGORY, self.VIEW_NAME, view_ids[0], view_ids[1])
+            view_ids = (view_ids[0], view_ids[1], True)
+
+        def get_building_report(building):
+            for attempt in range(retries + 1):
+                report_content, report_id = None, None
+                try:
+                    report_content, report_id = self.run_VLAN_report(location=building, view_ids=view_ids,
+                                                                     cancel_event=cancel_event)
+                    return read_report(report_content)
+                except ReportCancelledError:
+                    raise
+                except Exception as e:
+                    metrics.increment('dnac_report_shard_failures_total')
+                    print(f"\n Attempt {attempt + 1} for {building['siteNameHierarchy']} failed: {e}")
+                finally:
+                    if report_id is not None:
+                        self.discard_report(report_id, report_content)
+            return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            building_reports = list(executor.map(get_building_report, buildings))
+
+        failed_buildings = [building['siteNameHierarchy'] for building, report in zip(buildings, building_reports) if report is None]
+        if failed_buildings:
+            print('VLAN reports for the following buildings failed:', failed_buildings)
+            sys.exit(1)
+
+        report = pandas.concat(building_reports, ignore_index=True)
+        self.check_unsharded_devices(set(report['IP Address'].astype(str)))
+
+        return report, None
+
+
+    def check_unsharded_devices(self, report_ips):
+        '''
+        Compares the inventory switches with the device IPs of the merged building reports and
+        warns about the switches that are in none of them. DNAC does not offer a location filter
+        for devices outside of all buildings, so their rows can only be retrieved with a single
+        report for all sites (REPORT_SHARD_WORKERS=0).
+        '''
+
+        try:
+            inventory_devices = self.dnac_api.get_inventory_devices(self.inventory_workers)
+        except Exception as e:
+            print(f"Exception -{e}: Retrieving the inventory to check the building reports failed")
+            return
+
+        missing_devices = sorted(device['hostname'] + ' (' + device['managementIpAddress'] + ')'
+                                 for device in inventory_devices if str(device['managementIpAddress']) not in report_ips)
+        metrics.set('dnac_report_unsharded_devices', len(missing_devices))
 
-        create_report_status = self.generate_VLAN_report(view_group_id, report_view_id)
+        if missing_devices:
+            print(f"\nWarning: {len(missing_devices)} inventory switch(es) are in no building report, e.g. because they "
+                  f"are not assigned to a building, and are missing from the custom report: {', '.join(missing_devices[:20])}"
+                  + (' ...' if len(missing_devices) > 20 else ''))
 
-        if (create_report_status.status_code == requests.codes.ok):
-            
-            report_id = create_report_status.json()['reportId']
 
-            print('VLAN Report submitted with ID', report_id)
-            print('Wait for report execution to start ...')
+    def discard_report(self, report_id, report_content=None):
+        '''
+        Deletes a report and removes its downloaded file, if any. Failures are only reported,
+        so they do not hide the outcome of the report.
+        '''
+
+        try:
+            self.delete_report(report_id)
+        except Exception as e:
+            print(f"Exception -{e}: Deleting report {report_id} failed")
+
+        if isinstance(report_content, pathlib.Path) and report_content.exists():
+            os.remove(report_content)
+
+
+    def run_VLAN_report(self, location=None, view_ids=None, cancel_event=None):
+        '''
+        Schedules a VLAN report (for a location, if given), waits for its execution and
+        returns the report content and report id. With a download folder, the report is 
+        streamed to a file in that folder and its path is returned instead of the content.
+        The view ids are looked up, unless already resolved in view_ids, as returned by 
+        get_report_view_ids. Raises ReportExecutionError if the report could not be scheduled
+        or its execution failed, and ReportCancelledError if cancel_event was set before the
+        report completed. A report that failed or was cancelled after it was scheduled is deleted.
+        '''
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise ReportCancelledError('VLAN report not submitted, as the run was cancelled')
+
+        view_group_id, report_view_id, from_cache = view_ids or self.get_report_view_ids()
+
+        create_report_status = self.generate_VLAN_report(view_group_id, report_view_id, location)
+
+        if create_report_status.status_code in self.STALE_VIEW_STATUS_CODES and from_cache:
+            print('Report not submitted with the cached view ids. Refreshing view ids ...')
+            self.view_cache.invalidate(self.REPORT_CATEGORY, self.VIEW_NAME)
+            view_group_id, report_view_id, from_cache = self.get_report_view_ids()
+            create_report_status = self.generate_VLAN_report(view_group_id, report_view_id, location)
+
+        if create_report_status.status_code != requests.codes.ok:
+            raise ReportExecutionError('Report not submitted. Code:\t{0}\tStatus:\t{1} '.format(create_report_status.status_code, create_report_status.reason))
+
+        report_id = create_report_status.json()['reportId']
+
+        if self.view_cache is not None and not from_cache:
+            self.view_cache.set(self.REPORT_CATEGORY, self.VIEW_NAME, view_group_id, report_view_id)
+
+        print('VLAN Report submitted with ID', report_id)
+        print('Wait for report execution to start ...')
+
+        try:
+            execution_id = self.wait_for_report_execution(report_id, cancel_event)
+            return self.download_VLAN_report(report_id, execution_id)
+        except ReportCancelledError:
+            self.discard_report(report_id, self.report_path(report_id))
+            raise
+        except Exception:
+            metrics.increment('dnac_report_failures_total')
+            self.discard_report(report_id, self.report_path(report_id))
+            raise
+
+
+    def download_VLAN_report(self, report_id, execution_id):
+        '''
+        Downloads the content of a completed report execution, or streams it to a file in the
+        download folder and returns its path.
+        '''
 
-            execution_count = 0
-            while execution_count == 0:
-                time.sleep(1)
-                print('!', end="", flush=True)
-                report_details = self.dnac_api.get_report_executions(report_id)
-                execution_count = report_details['executionCount']
+        report_metrics = self.report_metrics[report_id]
+        metrics.observe('dnac_report_time_to_start_seconds', report_metrics['time_to_start'])
+        metrics.observe('dnac_report_time_to_complete_seconds', report_metrics['time_to_complete'])
+        metrics.increment('dnac_report_polls_total', report_metrics['polls'])
+        print('\n Report execution completed with ID: ', execution_id)
+        print('Waited {0:.1f}s for the report execution to start and {1:.1f}s for it to complete ({2} polls).'.format(
+            report_metrics['time_to_start'], report_metrics['time_to_complete'], report_metrics['polls']))
 
-            print('\n Report execution started, wait for process to complete ...')
+        report_path = self.report_path(report_id)
+
+        if report_path is not None:
+            with metrics.timer('dnac_report_download_seconds'):
+                size = self.dnac_api.download_report_file(report_id, execution_id, report_path)
+            metrics.increment('dnac_report_bytes_total', size)
+            print(f'Downloaded report content ({size} bytes) to {report_path}')
+            return report_path, report_id
+
+        with metrics.timer('dnac_report_download_seconds'):
+            report_content = self.dnac_api.get_report_file(report_id, execution_id)
+        metrics.increment('dnac_report_bytes_total', len(report_content))
+        print(f'Downloaded report content ({len(report_content)} characters)')
+
+        return report_content, report_id
+
+
+    def report_path(self, report_id):
+        '''
+        Returns the path a report is downloaded to, or None without a download folder.
+        '''
+
+        if self.download_folder is None:
+            return None
+
+        return pathlib.Path(self.download_folder) / f"dnac_vlan_report_{report_id}.csv"
+
+
+    def wait_for_report_execution(self, report_id, cancel_event=None):
+        '''
+        Polls the executions of a report until the latest execution succeeded and returns its id.
+        The first polls are poll_interval seconds apart, the interval then grows by poll_backoff
+        up to max_poll_interval. Raises ReportExecutionError if the execution failed or was cancelled,
+        or if it did not complete within report_deadline seconds, and ReportCancelledError as soon
+        as cancel_event is set. The time until the execution started and completed is stored in
+        report_metrics under the report id.
+        '''
+
+        start_time = time.monotonic()
+        deadline = start_time + self.report_deadline
+        interval = self.poll_interval
+        time_to_start = None
+        polls = 0
+
+        while True:
+            report_details = self.dnac_api.get_report_executions(report_id)
+            polls += 1
+
+            if report_details['executionCount'] > 0:
+
+                if time_to_start is None:
+                    time_to_start = time.monotonic() - start_time
+                    print('\n Report execution started, wait for process to complete ...')
 
-            process_status = None
-            while process_status != 'SUCCESS':
-                time.sleep(1)
-                print('!', end="", flush=True)
-                report_details = self.dnac_api.get_report_executions(report_id)
                 execution_info = report_details['executions'][0]
                 process_status = execution_info['processStatus']
 
-            execution_id = report_details['executions'][0]['executionId']
-            print('\n Report execution completed with ID: ', execution_id)
+                if process_status == 'SUCCESS':
+                    self.report_metrics[report_id] = {
+                        'time_to_start': time_to_start,
+                        'time_to_complete': time.monotonic() - start_time - time_to_start,
+                        'polls': polls
+                    }
+                    return execution_info['executionId']
 
-            report_content = self.dnac_api.get_report_file(report_id, execution_id)
-            print('Downloaded report content:', report_content)
+                if process_status in self.FAILED_PROCESS_STATUSES:
+                    raise ReportExecutionError(f"Report execution for report {report_id} ended with status {process_status}: {execution_info.get('errors')}")
 
-            return report_content, report_id
+            remaining_time = deadline - time.monotonic()
+            if remaining_time <= 0:
+                raise ReportExecutionError(f"Report execution for report {report_id} did not complete within {self.report_deadline} seconds")
 
-        else:
-            print('Report not submitted. Code:\t{0}tatus:\t{1} '.format(create_report_status.status_code, create_report_status.reason))
-            sys.exit(1)
+            if cancel_event is None:
+                time.sleep(min(interval, remaining_time))
+            elif cancel_event.wait(min(interval, remaining_time)):
+                raise ReportCancelledError(f"Report execution for report {report_id} was cancelled")
+            print('!', end="", flush=True)
+            interval = min(interval * self.poll_backoff, self.max_poll_interval)
 
 
     def delete_report(self, report_id):
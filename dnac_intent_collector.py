@@ -0,0 +1,124 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import pandas
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from custom_report import CustomReport
+from dnac_collector import ReportCancelledError
+from run_metrics import metrics
+
+
+class DNACIntentCollector:
+    '''
+    Builds the rows of the DNA Center VLAN report from the device interface and VLAN intent
+    APIs, instead of scheduling, downloading and deleting a report. This requires no report
+    permissions and no waiting for a report execution.
+    '''
+
+    def __init__(self, dnac_api, max_workers=8):
+
+        self.dnac_api = dnac_api
+        self.max_workers = max(1, int(max_workers))
+
+
+    def get_VLAN_interface_data(self, inventory_devices=None, cancel_event=None):
+        '''
+        Returns a data frame with the columns of the DNAC VLAN report, with one row per
+        physical interface with a VLAN of the Catalyst 9200L/9300/9500 inventory devices.
+        The interfaces of the devices are retrieved with up to max_workers concurrent requests.
+        If the interfaces of any device could not be retrieved, the script exits, as a report
+        without them would show their switch ports as missing. Setting cancel_event skips the
+        remaining devices and raises ReportCancelledError.
+        '''
+
+        if inventory_devices is None:
+            inventory_devices = self.dnac_api.get_inventory_devices(self.max_workers)
+
+        print(f"Retrieving interfaces and VLANs of {len(inventory_devices)} devices via the DNAC intent API ...")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            device_rows = list(executor.map(lambda device: self.get_device_rows(device, cancel_event), inventory_devices))
+
+        if cancel_event is not None and cancel_event.is_set():
+            raise ReportCancelledError('Retrieving the VLAN data via the DNAC intent API was cancelled')
+
+        failed_devices = [device.get('hostname') for device, rows in zip(inventory_devices, device_rows) if rows is None]
+        if failed_devices:
+            print('Retrieving the interfaces of the following devices failed:', failed_devices)
+            sys.exit(1)
+
+        rows = [row for rows in device_rows for row in rows]
+        vlan_data = pandas.DataFrame(rows, columns=CustomReport.DNAC_REPORT_COLUMNS.split(','))
+        vlan_data['Vlan Id'] = pandas.to_numeric(vlan_data['Vlan Id'], errors='coerce').astype('Int64')
+
+        print(f"Retrieved {len(vlan_data)} VLAN interface rows")
+        metrics.set('dnac_vlan_rows', len(vlan_data))
+
+        return vlan_data
+
+
+    def get_device_rows(self, device, cancel_event=None):
+        '''
+        Returns the report rows of a single inventory device, or None if its interfaces could not
+        be retrieved. VLAN names are taken from the device VLAN API where DNAC provides them, and
+        are left empty otherwise, also if the VLAN API failed. Once cancel_event is set, no
+        requests are sent and no rows are returned.
+        '''
+
+        if cancel_event is not None and cancel_event.is_set():
+            return []
+
+        try:
+            with metrics.timer('dnac_intent_device_seconds'):
+                interfaces = self.dnac_api.get_device_interfaces(device['id'])
+                vlan_names = self.get_device_vlan_names(device)
+
+            location = device.get('locationName') or device.get('location') or ''
+            rows = []
+
+            for interface in interfaces:
+                vlan_id = interface.get('vlanId')
+                if interface.get('interfaceType') != 'Physical' or vlan_id in (None, '', '0'):
+                    continue
+
+                rows.append((device.get('managementIpAddress'), device.get('hostname'), location, device.get('family'),
+                             device.get('type'), vlan_id, vlan_names.get(str(vlan_id), ''), interface.get('portName'),
+                             interface.get('adminStatus'), interface.get('status')))
+
+        except Exception as e:
+            print(f"Exception -{e}: Retrieving interfaces of device: {device.get('hostname')} failed")
+            metrics.increment('dnac_intent_device_failures_total')
+            return None
+
+        return rows
+
+
+    def get_device_vlan_names(self, device):
+        '''
+        Returns the VLAN names of a single inventory device by VLAN id. A failed VLAN request
+        only leaves the names empty.
+        '''
+
+        try:
+            vlans = self.dnac_api.get_device_vlans(device['id'])
+        except Exception as e:
+            print(f"Exception -{e}: Retrieving VLANs of device: {device.get('hostname')} failed, VLAN names are left empty")
+            metrics.increment('dnac_intent_vlan_failures_total')
+            return {}
+
+        return {str(vlan.get('vlanNumber')): vlan.get('vlanName') or '' for vlan in vlans}
@@ -0,0 +1,84 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import re
+from interface_normalizer import InterfaceNameNormalizer
+
+
+class InterfaceLinkParser():
+    '''
+    Lightweight parser for the IOS-XE "show interfaces link" output. It returns the same
+    structure as the Genie parser for the fields used by the report, keyed by the canonical
+    (long) interface name:
+
+    {'interfaces': {'GigabitEthernet1/0/1': {'name': 'description', 'down_time': '00:00:00', 'up_time': '3w2d'}}}
+
+    Unlike the Genie parser, it keeps the rows with durations of more than a year, e.g. 2y23w.
+    '''
+
+    HEADER_PATTERN = re.compile(r"^Port\s+Name\s+Down Time\s+Up Time\s*$")
+    INTERFACE_PATTERN = re.compile(r"^[A-Za-z][A-Za-z-]*\d[\d/.:]*$")
+    DURATION_PATTERN = re.compile(r"^(?:\d+:\d\d:\d\d|\d+[ywdhms](?:\d+[ywdhms])*|never)?$")
+
+    def __init__(self):
+        self.interface_normalizer = InterfaceNameNormalizer()
+
+
+    def parse(self, output):
+        '''
+        Parses the raw command output. Returns None if a line is not recognized, so the
+        caller can fall back to the Genie parser.
+        '''
+
+        columns = None
+        interfaces = {}
+
+        for line in output.splitlines():
+
+            if not line.strip():
+                continue
+
+            if columns is None:
+                if self.HEADER_PATTERN.match(line.strip()):
+                    header = line.rstrip()
+                    columns = (header.index('Name'), header.index('Down Time'), header.index('Up Time'))
+                    continue
+                return None
+
+            name_column, down_time_column, up_time_column = columns
+            interface = line[:name_column].strip()
+            name = line[name_column:down_time_column].strip()
+            down_time = line[down_time_column:up_time_column].strip()
+            up_time = line[up_time_column:].strip()
+
+            if not (self.INTERFACE_PATTERN.match(interface) and line[name_column - 1:name_column].isspace()
+                    and self.DURATION_PATTERN.match(down_time) and self.DURATION_PATTERN.match(up_time)):
+                return None
+
+            interface_dict = {}
+            if name:
+                interface_dict['name'] = name
+            if down_time:
+                interface_dict['down_time'] = down_time
+            if up_time:
+                interface_dict['up_time'] = up_time
+            interfaces[self.interface_normalizer.normalize(interface)] = interface_dict
+
+        if not interfaces:
+            return None
+
+        return {'interfaces': interfaces}
@@ -0,0 +1,117 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import re
+
+
+class InterfaceNameNormalizer():
+
+    # IOS-XE long interface names and the abbreviations used in the CLI output
+    INTERFACE_TYPES = {
+        'GigabitEthernet': 'Gi',
+        'TwoGigabitEthernet': 'Tw',
+        'FiveGigabitEthernet': 'Fi',
+        'TenGigabitEthernet': 'Te',
+        'TwentyFiveGigE': 'Twe',
+        'FortyGigabitEthernet': 'Fo',
+        'HundredGigE': 'Hu',
+        'TwoHundredGigE': 'TH',
+        'FourHundredGigE': 'FH',
+        'AppGigabitEthernet': 'Ap',
+        'FastEthernet': 'Fa',
+        'Port-channel': 'Po',
+        'Vlan': 'Vl',
+        'Loopback': 'Lo',
+        'Tunnel': 'Tu'
+    }
+
+    # Alternative spellings seen in DNAC and older software releases
+    INTERFACE_ALIASES = {
+        'TwentyFiveGigabitEthernet': 'TwentyFiveGigE',
+        'FortyGigE': 'FortyGigabitEthernet',
+        'HundredGigabitEthernet': 'HundredGigE',
+        'Gig': 'GigabitEthernet',
+        'Ten': 'TenGigabitEthernet'
+    }
+
+    INTERFACE_NAME_PATTERN = re.compile(r"^\s*([A-Za-z][A-Za-z-]*?)\s*(\d[\d/.:]*)?\s*$")
+
+
+    def __init__(self):
+
+        self.long_names = {}
+        for long_name, short_name in self.INTERFACE_TYPES.items():
+            self.long_names[long_name.lower()] = long_name
+            self.long_names[short_name.lower()] = long_name
+        for alias, long_name in self.INTERFACE_ALIASES.items():
+            self.long_names[alias.lower()] = long_name
+
+        self.cache = {}
+
+
+    def normalize(self, interface_name):
+        '''
+        Returns the canonical (long) IOS-XE name for an interface name in long or short form,
+        e.g. Gi1/0/1 and GigabitEthernet1/0/1 both become GigabitEthernet1/0/1. Names of unknown
+        interface types are returned stripped but otherwise unchanged. Each distinct name is
+        only resolved once.
+        '''
+        canonical_name = self.cache.get(interface_name)
+
+        if canonical_name is None:
+            canonical_name = self.resolve(interface_name)
+            self.cache[interface_name] = canonical_name
+
+        return canonical_name
+
+
+    def abbreviate(self, interface_name):
+        '''
+        Returns the short IOS-XE name for an interface name in long or short form,
+        e.g. TwentyFiveGigE1/1/1 becomes Twe1/1/1.
+        '''
+        canonical_name = self.normalize(interface_name)
+        match = self.INTERFACE_NAME_PATTERN.match(canonical_name)
+
+        if match and match.group(1) in self.INTERFACE_TYPES:
+            return self.INTERFACE_TYPES[match.group(1)] + (match.group(2) or '')
+
+        return canonical_name
+
+
+    def normalize_series(self, interface_names):
+        '''
+        Vectorized version of normalize for a pandas Series. Only the distinct names of the
+        series are resolved, all rows are then mapped with a single lookup.
+        '''
+        mapping = {name: self.normalize(name) for name in interface_names.dropna().unique()}
+
+        return interface_names.map(mapping)
+
+
+    def resolve(self, interface_name):
+
+        interface_name = str(interface_name)
+        match = self.INTERFACE_NAME_PATTERN.match(interface_name)
+
+        if not match:
+            return interface_name.strip()
+
+        interface_type, interface_number = match.groups()
+        long_name = self.long_names.get(interface_type.lower(), interface_type)
+
+        return long_name + (interface_number or '')
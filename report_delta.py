@@ -0,0 +1,181 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import os
+import numpy
+import pandas
+from interface_normalizer import InterfaceNameNormalizer
+from report_writers import REPORT_FORMATS, create_report_writer
+
+
+class ReportDeltaTracker():
+    '''
+    Report consumer that writes only the custom report rows that changed since the previous run,
+    with a Change column: added, changed (admin or operational status), uptime_reset (same state,
+    but a lower uptime than before) or removed. A row is identified by IP, interface and VLAN,
+    since an interface can have a row per VLAN, so a changed VLAN shows as a removed and an added
+    row. The previous run is kept as a fingerprint with one hash of the state per row key, so each
+    chunk is compared with a vectorized hash lookup instead of a diff of the previous report.
+    '''
+
+    STATE_COLUMNS = ['Admin Status', 'Operational Status']
+    CHANGES = ['added', 'changed', 'uptime_reset', 'removed']
+
+    def __init__(self, fingerprint_filename, output_format='csv', output_path=None):
+
+        if output_path is None and output_format in REPORT_FORMATS:
+            output_path = REPORT_FORMATS[output_format][1].replace('vlan_report', 'vlan_report_delta')
+
+        self.fingerprint_filename = fingerprint_filename
+        self.report_writer = create_report_writer(output_format, output_path)
+        self.interface_normalizer = InterfaceNameNormalizer()
+        self.previous = None
+        self.fingerprints = []
+        self.dtypes = None
+        self.change_counts = dict.fromkeys(self.CHANGES, 0)
+
+
+    def __enter__(self):
+
+        self.previous = self.load()
+        self.previous_state = self.previous['State Hash'].to_numpy()
+        self.previous_uptime = self.previous['Uptime Seconds'].to_numpy('float64', na_value=numpy.nan)
+        self.report_writer.__enter__()
+        return self
+
+
+    def write(self, data_frame):
+
+        fingerprint = self.fingerprint(data_frame)
+        self.fingerprints.append(fingerprint)
+        if self.dtypes is None:
+            self.dtypes = data_frame.dtypes
+
+        change = self.detect_changes(fingerprint)
+        changed_rows = change != ''
+        delta = data_frame[changed_rows].copy()
+        delta.insert(0, 'Change', change[changed_rows])
+
+        self.report_writer.write(delta)
+        self.count_changes(delta['Change'])
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        try:
+            if exc_type is None and self.dtypes is not None:
+                current = pandas.concat(self.fingerprints)
+                current = current[~current.index.duplicated(keep='first')]
+                self.write_removed_rows(current)
+                self.save(current)
+        finally:
+            self.report_writer.__exit__(exc_type, exc_value, traceback)
+
+        if exc_type is None:
+            print(f"Delta report with the name *{self.report_writer.output_path}* created: " +
+                  ', '.join(f"{count} {change}" for change, count in self.change_counts.items()))
+
+
+    def fingerprint(self, data_frame):
+        '''
+        Returns per report row the hash of IP, canonical interface name and VLAN as index, and the
+        hash of the state columns, the uptime in seconds and the key columns as columns.
+        '''
+
+        keys = pandas.DataFrame({
+            'IP Address': data_frame['IP Address'].astype(str).to_numpy(),
+            'Interface Key': self.interface_normalizer.normalize_series(data_frame['Interface Name'].astype(str)).to_numpy(),
+            'Vlan Id': data_frame['Vlan Id'].astype('Int64').array
+        })
+
+        return pandas.DataFrame({
+            'State Hash': pandas.util.hash_pandas_object(data_frame[self.STATE_COLUMNS], index=False).to_numpy(),
+            'Uptime Seconds': data_frame['Uptime Seconds'].astype('Int64').array,
+            'IP Address': data_frame['IP Address'].astype(str).to_numpy(),
+            'Interface Name': data_frame['Interface Name'].astype(str).to_numpy(),
+            'Vlan Id': data_frame['Vlan Id'].astype('Int64').array
+        }, index=pandas.Index(pandas.util.hash_pandas_object(keys, index=False).to_numpy(), name='Key Hash'))
+
+
+    def detect_changes(self, fingerprint):
+        '''
+        Returns per row of the fingerprint its change since the previous run, or an empty string.
+        '''
+
+        if len(self.previous) == 0:
+            return numpy.full(len(fingerprint), 'added', dtype=object)
+
+        positions = self.previous.index.get_indexer(fingerprint.index)
+        known = positions >= 0
+        positions = numpy.where(known, positions, 0)
+
+        changed = known & (self.previous_state[positions] != fingerprint['State Hash'].to_numpy())
+        uptime = fingerprint['Uptime Seconds'].to_numpy('float64', na_value=numpy.nan)
+        uptime_reset = known & ~changed & (uptime < self.previous_uptime[positions])
+
+        return numpy.select([~known, changed, uptime_reset], ['added', 'changed', 'uptime_reset'], '').astype(object)
+
+
+    def write_removed_rows(self, current):
+        '''
+        Writes the IP, interface and VLAN of the rows of the previous run that are not in this run.
+        '''
+
+        removed = self.previous[~self.previous.index.isin(current.index)]
+        if len(removed) == 0:
+            return
+
+        removed_rows = pandas.DataFrame({'IP Address': removed['IP Address'].astype(str).to_numpy(),
+                                         'Interface Name': removed['Interface Name'].astype(str).to_numpy(),
+                                         'Vlan Id': removed['Vlan Id'].astype('Int64').array})
+        removed_rows = removed_rows.reindex(columns=self.dtypes.index).astype(self.dtypes.to_dict())
+        removed_rows.insert(0, 'Change', 'removed')
+
+        self.report_writer.write(removed_rows)
+        self.count_changes(removed_rows['Change'])
+
+
+    def count_changes(self, changes):
+
+        for change, count in changes.value_counts().items():
+            self.change_counts[change] += int(count)
+
+
+    def load(self):
+
+        if os.path.exists(self.fingerprint_filename):
+            try:
+                previous = pandas.read_pickle(self.fingerprint_filename)
+            except Exception as e:
+                print(f"Ignoring unreadable report fingerprint {self.fingerprint_filename}: {e}")
+            else:
+                if 'Vlan Id' in previous.columns:
+                    return previous
+                print(f"Ignoring report fingerprint {self.fingerprint_filename} of an earlier version without VLAN keys")
+
+        return pandas.DataFrame({'State Hash': pandas.Series(dtype='uint64'), 'Uptime Seconds': pandas.Series(dtype='Int64'),
+                                 'IP Address': pandas.Series(dtype=object), 'Interface Name': pandas.Series(dtype=object),
+                                 'Vlan Id': pandas.Series(dtype='Int64')},
+                                index=pandas.Index([], dtype='uint64', name='Key Hash'))
+
+
+    def save(self, fingerprint):
+
+        fingerprint = fingerprint.astype({'IP Address': 'category', 'Interface Name': 'category'})
+        temporary_filename = self.fingerprint_filename + '.tmp'
+        fingerprint.to_pickle(temporary_filename)
+        os.replace(temporary_filename, self.fingerprint_filename)
@@ -0,0 +1,302 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import email.utils
+import hashlib
+import json
+import math
+import threading
+import time
+import numpy
+import pandas
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class ReportSnapshot():
+    '''
+    Immutable custom report held in memory, with the row positions per device name and IP,
+    location and VLAN, and the rows sorted by down time, so a filtered request only looks up
+    and intersects positions. Rendered responses are cached per filter and format, least recently
+    used first evicted once they take more than MAX_CACHE_BYTES together.
+    '''
+
+    FILTER_COLUMNS = {'location': ['Location'], 'vlan': ['Vlan Id'], 'device': ['Device Name', 'IP Address']}
+    MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, data_frame, previous=None):
+
+        self.data = data_frame.reset_index(drop=True)
+        self.version = hashlib.sha1(pandas.util.hash_pandas_object(self.data, index=False).to_numpy().tobytes()).hexdigest()[:20]
+        unchanged = previous is not None and previous.version == self.version
+        self.last_modified = previous.last_modified if unchanged else int(time.time())
+
+        self.indexes = {}
+        for name, columns in self.FILTER_COLUMNS.items():
+            self.indexes[name] = {}
+            for column in columns:
+                if column in self.data.columns:
+                    positions = self.data.groupby(column, observed=True, sort=False).indices
+                    self.indexes[name].update({str(value): numpy.asarray(rows) for value, rows in positions.items()})
+
+        down_time = self.data['Down Time Seconds'].to_numpy('float64', na_value=numpy.nan) \
+            if 'Down Time Seconds' in self.data.columns else numpy.full(len(self.data), numpy.nan)
+        self.down_time_order = numpy.argsort(down_time, kind='stable')
+        self.sorted_down_time = down_time[self.down_time_order]
+        self.down_time_count = int(numpy.count_nonzero(~numpy.isnan(down_time)))
+
+        self.rendered = OrderedDict()
+        self.rendered_bytes = 0
+        self.rendered_lock = threading.Lock()
+
+
+    def render(self, filters, output_format):
+        '''
+        Returns the rendered response for the filters and format from the cache, or renders and
+        caches it. Responses larger than MAX_CACHE_BYTES are rendered for every request.
+        '''
+
+        key = (filters, output_format)
+
+        with self.rendered_lock:
+            if key in self.rendered:
+                self.rendered.move_to_end(key)
+                return self.rendered[key]
+
+        content = self.render_rows(filters, output_format)
+        if len(content) > self.MAX_CACHE_BYTES:
+            return content
+
+        with self.rendered_lock:
+            if key not in self.rendered:
+                self.rendered[key] = content
+                self.rendered_bytes += len(content)
+            while self.rendered_bytes > self.MAX_CACHE_BYTES:
+                _, evicted = self.rendered.popitem(last=False)
+                self.rendered_bytes -= len(evicted)
+
+        return content
+
+
+    def select_rows(self, filters):
+        '''
+        Returns the sorted positions of the rows matching all filters: device (name or IP),
+        location, vlan and min_down_seconds.
+        '''
+
+        selected = None
+
+        for name, value in filters:
+            if name == 'min_down_seconds':
+                start = numpy.searchsorted(self.sorted_down_time[:self.down_time_count], value, side='left')
+                rows = numpy.sort(self.down_time_order[start:self.down_time_count])
+            else:
+                rows = self.indexes[name].get(value, numpy.empty(0, dtype=numpy.intp))
+            selected = rows if selected is None else numpy.intersect1d(selected, rows, assume_unique=True)
+
+        return numpy.arange(len(self.data)) if selected is None else selected
+
+
+    def render_rows(self, filters, output_format):
+        '''
+        Returns the matching rows as JSON records or as semicolon separated CSV.
+        '''
+
+        rows = self.data.iloc[self.select_rows(filters)]
+
+        if output_format == 'csv':
+            return rows.to_csv(sep=";", index=False).encode()
+        return rows.to_json(orient='records').encode()
+
+
+class ReportSnapshotBuilder():
+    '''
+    Report consumer that collects the chunks of the custom report into a ReportSnapshot.
+    '''
+
+    def __init__(self, previous=None):
+
+        self.previous = previous
+        self.chunks = []
+        self.snapshot = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def write(self, data_frame):
+        self.chunks.append(data_frame)
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None and self.chunks:
+            self.snapshot = ReportSnapshot(pandas.concat(self.chunks, ignore_index=True), self.previous)
+        self.chunks = []
+
+
+class ReportService():
+    '''
+    Read-only HTTP service for the latest custom report:
+
+    GET /report.json or /report.csv[?device=...&location=...&vlan=...&min_down_seconds=...]
+    GET /status
+
+    Responses carry an ETag and Last-Modified and are answered with 304 Not Modified for matching
+    conditional requests. A refresh builds a new snapshot and replaces the current one with a
+    single assignment, so requests are never blocked by a refresh and always see one complete report.
+    '''
+
+    CONTENT_TYPES = {'json': 'application/json', 'csv': 'text/csv; charset=utf-8'}
+
+    def __init__(self, host='127.0.0.1', port=8080):
+
+        self.snapshot = None
+        self.refreshed = None
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+
+    def start(self):
+
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Serving the custom report on http://{self.server.server_address[0]}:{self.server.server_address[1]}/report.json")
+        return self
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def snapshot_builder(self):
+        return ReportSnapshotBuilder(self.snapshot)
+
+
+    def publish(self, snapshot_builder):
+
+        if snapshot_builder.snapshot is not None:
+            self.snapshot = snapshot_builder.snapshot
+            self.refreshed = time.time()
+
+
+    def handler_class(self):
+
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                service.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+    def handle(self, handler):
+
+        snapshot = self.snapshot
+        url = urlparse(handler.path)
+
+        if url.path == '/status':
+            status = {'rows': len(snapshot.data) if snapshot else 0, 'version': snapshot.version if snapshot else None,
+                      'last_modified': snapshot.last_modified if snapshot else None, 'refreshed': self.refreshed}
+            return self.respond(handler, 200, json.dumps(status).encode(), self.CONTENT_TYPES['json'])
+
+        if url.path not in ('/report', '/report.json', '/report.csv'):
+            return self.respond(handler, 404, b'{"error": "Not found"}', self.CONTENT_TYPES['json'])
+
+        if snapshot is None:
+            return self.respond(handler, 503, b'{"error": "No report available yet"}', self.CONTENT_TYPES['json'],
+                                {'Retry-After': '60'})
+
+        query = parse_qs(url.query)
+        output_format = 'csv' if url.path == '/report.csv' or query.get('format') == ['csv'] else 'json'
+
+        try:
+            filters = self.parse_filters(query)
+        except ValueError as e:
+            return self.respond(handler, 400, json.dumps({'error': str(e)}).encode(), self.CONTENT_TYPES['json'])
+
+        etag = '"' + hashlib.sha1(f"{snapshot.version}|{output_format}|{filters}".encode()).hexdigest()[:24] + '"'
+        headers = {'ETag': etag, 'Last-Modified': email.utils.formatdate(snapshot.last_modified, usegmt=True),
+                   'Cache-Control': 'no-cache'}
+
+        if self.not_modified(handler, etag, snapshot.last_modified):
+            return self.respond(handler, 304, b'', None, headers)
+
+        return self.respond(handler, 200, snapshot.render(filters, output_format), self.CONTENT_TYPES[output_format], headers)
+
+
+    def parse_filters(self, query):
+        '''
+        Returns the filters of the query string as sorted tuple, so equal queries share the cached response.
+        The minimum down time is converted to seconds as float, so e.g. 86400, 86400.0 and
+        min_down_days=1 are the same filter.
+        '''
+
+        filters = []
+
+        for name in ('device', 'location', 'vlan', 'min_down_seconds', 'min_down_days'):
+            if name not in query:
+                continue
+            value = query[name][-1]
+            if name == 'min_down_days':
+                name, value = 'min_down_seconds', float(value) * 86400
+            if name == 'min_down_seconds':
+                value = float(value)
+                if not math.isfinite(value):
+                    raise ValueError(f"min_down_seconds must be a finite number, not {value}")
+            filters.append((name, value))
+
+        return tuple(sorted(filters))
+
+
+    def not_modified(self, handler, etag, last_modified):
+
+        if_none_match = handler.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+        if_modified_since = handler.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                return email.utils.parsedate_to_datetime(if_modified_since).timestamp() >= last_modified
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+
+    def respond(self, handler, status, content, content_type, headers=None):
+
+        handler.send_response(status)
+        if content_type is not None:
+            handler.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import gzip
+import io
+import pandas
+
+
+class ReportWriter():
+    '''
+    Writes the custom report chunk by chunk. Use as context manager:
+
+    with create_report_writer('parquet') as writer:
+        writer.write(data_frame)
+    '''
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.rows = 0
+
+
+    def __enter__(self):
+        self.open()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def open(self):
+        pass
+
+
+    def write(self, data_frame):
+        self.write_chunk(data_frame)
+        self.rows += len(data_frame)
+
+
+    def write_chunk(self, data_frame):
+        raise NotImplementedError
+
+
+    def close(self):
+        pass
+
+
+class CSVReportWriter(ReportWriter):
+    '''
+    Semicolon separated CSV, optionally gzip or zstd compressed.
+    '''
+
+    def __init__(self, output_path, compression=None):
+        super().__init__(output_path)
+        self.compression = compression
+        self.output_file = None
+        self.header = True
+
+
+    def open(self):
+        self.output_file = open_text_output(self.output_path, self.compression)
+
+
+    def write_chunk(self, data_frame):
+        data_frame.to_csv(self.output_file, sep=";", header=self.header, index=False)
+        self.header = False
+
+
+    def close(self):
+        if self.output_file is not None:
+            self.output_file.close()
+            self.output_file = None
+
+
+class NDJSONReportWriter(CSVReportWriter):
+    '''
+    Newline-delimited JSON with one object per report row, optionally gzip or zstd compressed.
+    '''
+
+    def write_chunk(self, data_frame):
+        records = data_frame.to_json(orient='records', lines=True, date_format='iso')
+        self.output_file.write(records if records.endswith('\n') else records + '\n')
+
+
+class ParquetReportWriter(ReportWriter):
+    '''
+    Parquet file written as one row group per chunk. Requires pyarrow.
+    '''
+
+    def __init__(self, output_path):
+        super().__init__(output_path)
+        self.parquet_writer = None
+        self.schema = None
+
+
+    def write_chunk(self, data_frame):
+
+        import pyarrow
+        import pyarrow.parquet
+
+        categorical_columns = [column for column, dtype in data_frame.dtypes.items() if isinstance(dtype, pandas.CategoricalDtype)]
+        data_frame = data_frame.astype({column: object for column in categorical_columns})
+
+        if self.schema is None:
+            self.schema = pyarrow.schema([(column, self.arrow_type(pyarrow, dtype)) for column, dtype in data_frame.dtypes.items()])
+            self.parquet_writer = pyarrow.parquet.ParquetWriter(self.output_path, self.schema, compression='zstd')
+
+        table = pyarrow.Table.from_pandas(data_frame, schema=self.schema, preserve_index=False)
+        self.parquet_writer.write_table(table)
+
+
+    def arrow_type(self, pyarrow, dtype):
+
+        if dtype == object:
+            return pyarrow.string()
+        if isinstance(dtype, pandas.api.extensions.ExtensionDtype):
+            return pyarrow.from_numpy_dtype(dtype.numpy_dtype)
+        return pyarrow.from_numpy_dtype(dtype)
+
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+
+
+def open_text_output(output_path, compression=None):
+    '''
+    Opens a text file for writing, optionally gzip or zstd (requires zstandard) compressed.
+    '''
+
+    if compression == 'gzip':
+        return gzip.open(output_path, 'wt', encoding='utf-8', newline='')
+
+    if compression == 'zstd':
+        import zstandard
+        binary_file = zstandard.ZstdCompressor().stream_writer(open(output_path, 'wb'), closefd=True)
+        return io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+
+    return open(output_path, 'w', encoding='utf-8', newline='')
+
+
+REPORT_FORMATS = {
+    'csv': (lambda path: CSVReportWriter(path), 'vlan_report.csv'),
+    'csv.gz': (lambda path: CSVReportWriter(path, 'gzip'), 'vlan_report.csv.gz'),
+    'csv.zst': (lambda path: CSVReportWriter(path, 'zstd'), 'vlan_report.csv.zst'),
+    'ndjson': (lambda path: NDJSONReportWriter(path), 'vlan_report.ndjson'),
+    'ndjson.gz': (lambda path: NDJSONReportWriter(path, 'gzip'), 'vlan_report.ndjson.gz'),
+    'parquet': (lambda path: ParquetReportWriter(path), 'vlan_report.parquet')
+}
+
+
+def create_report_writer(output_format='csv', output_path=None):
+    '''
+    Returns the writer for one of the REPORT_FORMATS. Without an output path, the report is
+    written to vlan_report.<format> in the current folder.
+    '''
+
+    if output_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format {output_format}. Supported formats: {', '.join(REPORT_FORMATS)}")
+
+    create_writer, default_path = REPORT_FORMATS[output_format]
+
+    return create_writer(output_path or default_path)
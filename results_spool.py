@@ -0,0 +1,164 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import threading
+
+
+class ResultsSpool():
+    '''
+    Append-only JSONL file with one line per successfully polled device:
+
+    {"run_id": "...", "device": "<hostname>", "result": {"<ip>": <parsed output>}}
+
+    Each result is written as soon as the device was polled, so a crashed or killed run
+    can be resumed with the same run id. Iterating over the spool yields the results of
+    the run one by one, in the same shape as DeviceCollector.parse_all_devices returns them.
+    A new run appends to the spool and only removes the results of runs beyond the last keep_runs.
+    '''
+
+    def __init__(self, spool_filename, run_id=None, resume=False, keep_runs=5):
+
+        self.spool_filename = spool_filename
+        self.lock = threading.Lock()
+        self.spool_file = None
+
+        if resume:
+            self.run_id = run_id or self.last_run_id()
+            if self.run_id is None:
+                print(f"No previous run found in {spool_filename}. Starting a new run ...")
+                resume = False
+
+        if resume:
+            self.terminate_last_line()
+        else:
+            self.run_id = run_id or datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+            self.trim_runs(keep_runs - 1)
+            self.terminate_last_line()
+
+        print(f"Spooling device results for run {self.run_id} to {self.spool_filename}")
+
+
+    def last_run_id(self):
+        '''
+        Returns the run id of the last result in the spool, or None if the spool is empty.
+        '''
+
+        run_id = None
+        for entry in self.read_entries():
+            run_id = entry['run_id']
+        return run_id
+
+
+    def trim_runs(self, previous_runs):
+        '''
+        Removes the results of all but the last previous_runs runs, and earlier results with the
+        run id of this run, so a new run with a reused run id starts empty. The spool is only
+        rewritten if anything is removed, atomically via a temporary file in the same folder.
+        '''
+
+        run_ids = list(dict.fromkeys(entry['run_id'] for entry in self.read_entries()))
+        previous_run_ids = [run_id for run_id in run_ids if run_id != self.run_id]
+        kept_run_ids = set(previous_run_ids[-previous_runs:] if previous_runs > 0 else [])
+
+        if len(kept_run_ids) == len(run_ids):
+            return
+
+        folder = os.path.dirname(os.path.abspath(self.spool_filename))
+        file_descriptor, temporary_filename = tempfile.mkstemp(prefix=os.path.basename(self.spool_filename), suffix='.tmp', dir=folder)
+
+        try:
+            with os.fdopen(file_descriptor, 'w') as spool_file:
+                for entry in self.read_entries():
+                    if entry['run_id'] in kept_run_ids:
+                        spool_file.write(json.dumps(entry) + '\n')
+            os.replace(temporary_filename, self.spool_filename)
+        except BaseException:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+            raise
+
+        print(f"Removed the results of {len(run_ids) - len(kept_run_ids)} run(s) from {self.spool_filename}")
+
+
+    def terminate_last_line(self):
+        '''
+        Ends a last line that was cut off by a killed run, so new results start on their own line.
+        '''
+
+        if not os.path.exists(self.spool_filename):
+            return
+
+        with open(self.spool_filename, 'rb+') as spool_file:
+            spool_file.seek(0, os.SEEK_END)
+            if spool_file.tell() > 0:
+                spool_file.seek(-1, os.SEEK_END)
+                if spool_file.read(1) != b'\n':
+                    spool_file.write(b'\n')
+
+
+    def completed_devices(self):
+        '''
+        Returns the names of the devices that were already polled successfully in this run.
+        '''
+
+        return {entry['device'] for entry in self.read_entries() if entry['run_id'] == self.run_id}
+
+
+    def append(self, device_name, result):
+
+        line = json.dumps({'run_id': self.run_id, 'device': device_name, 'result': result})
+
+        with self.lock:
+            if self.spool_file is None:
+                self.spool_file = open(self.spool_filename, 'a')
+            self.spool_file.write(line + '\n')
+            self.spool_file.flush()
+
+
+    def close(self):
+
+        with self.lock:
+            if self.spool_file is not None:
+                self.spool_file.close()
+                self.spool_file = None
+
+
+    def __iter__(self):
+
+        for entry in self.read_entries():
+            if entry['run_id'] == self.run_id:
+                yield entry['result']
+
+
+    def read_entries(self):
+        '''
+        Yields the entries of the spool. A truncated last line, e.g. from a killed run, is skipped.
+        '''
+
+        if not os.path.exists(self.spool_filename):
+            return
+
+        with open(self.spool_filename) as spool_file:
+            for line in spool_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    print(f"Skipping incomplete entry in {self.spool_filename}")
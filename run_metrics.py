@@ -0,0 +1,269 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunMetrics():
+    '''
+    Process-wide timings and counters of a run: the duration of each phase, latency histograms,
+    counters and gauges, each with optional labels. The metrics are exported as Prometheus
+    textfile (for the node exporter textfile collector) and as JSON run summary. One phase
+    can be profiled with cProfile.
+
+    Phases are tracked per thread, so phases of different threads can overlap, e.g. the DNAC
+    report generated in the background while the main thread polls the devices.
+    '''
+
+    BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+    def __init__(self, prefix='uptime_report'):
+
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.phases = {}
+        self.thread_phase = threading.local()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.profile_phase = None
+        self.profile_filename = None
+
+
+    def profile(self, phase, profile_filename=None):
+        '''
+        Runs cProfile while the given phase is active. Only the thread that runs the phase is profiled.
+        '''
+
+        self.profile_phase = phase
+        self.profile_filename = profile_filename or f"profile_{phase.replace(' ', '_')}.prof"
+
+
+    def set_phase(self, phase):
+        '''
+        Ends the current phase of the calling thread, recording its duration, and starts the given
+        phase. A phase that runs again, e.g. in every daemon cycle, keeps the duration of its last run.
+        '''
+
+        now = time.perf_counter()
+        current = self.thread_phase
+
+        if getattr(current, 'phase', None) is not None:
+            self.record_phase(current.phase, now - current.start)
+            if current.profiler is not None:
+                self.stop_profiler(current.profiler, current.phase)
+
+        current.phase = phase
+        current.start = now
+        current.profiler = self.start_profiler(phase)
+
+
+    @contextmanager
+    def phase(self, phase):
+        '''
+        Records the duration of the with block as phase, independent of the phase of the calling
+        thread, e.g. for a task that runs in the background while other phases go on.
+        '''
+
+        profiler = self.start_profiler(phase)
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.record_phase(phase, time.perf_counter() - start)
+            if profiler is not None:
+                self.stop_profiler(profiler, phase)
+
+
+    def finish(self):
+        self.set_phase(None)
+
+
+    def record_phase(self, phase, duration):
+
+        with self.lock:
+            self.phases[phase] = duration
+
+
+    def increment(self, name, value=1, **labels):
+
+        key = (name, self.label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+    def set(self, name, value, **labels):
+
+        with self.lock:
+            self.gauges[(name, self.label_key(labels))] = value
+
+
+    def observe(self, name, value, **labels):
+
+        key = (name, self.label_key(labels))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, {'buckets': [0] * len(self.BUCKETS), 'sum': 0.0, 'count': 0})
+            index = bisect.bisect_left(self.BUCKETS, value)
+            if index < len(self.BUCKETS):
+                histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+
+    @contextmanager
+    def timer(self, name, **labels):
+        '''
+        Observes the duration of the with block in the histogram name, also if the block raises.
+        '''
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+
+    def label_key(self, labels):
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+    def start_profiler(self, phase):
+        '''
+        Returns an enabled cProfile profiler of the calling thread if phase is the profiled phase, otherwise None.
+        '''
+
+        if phase is None or phase != self.profile_phase:
+            return None
+
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+
+    def stop_profiler(self, profiler, phase):
+
+        profiler.disable()
+
+        import pstats
+        profiler.dump_stats(self.profile_filename)
+        print(f"\nProfile of phase {phase}, written to {self.profile_filename}:")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+
+    def summary(self):
+        '''
+        Returns all metrics as a dictionary. Histograms are summarized by count, sum and mean.
+        '''
+
+        def entries(metrics, value):
+            return [dict(labels, name=name, value=value(metric)) for (name, labels), metric in sorted(metrics.items())]
+
+        with self.lock:
+            return {
+                'started': self.started,
+                'duration_seconds': time.time() - self.started,
+                'phases': dict(self.phases),
+                'counters': entries(self.counters, lambda metric: metric),
+                'gauges': entries(self.gauges, lambda metric: metric),
+                'histograms': entries(self.histograms, lambda metric: {
+                    'count': metric['count'], 'sum': metric['sum'],
+                    'mean': metric['sum'] / metric['count'] if metric['count'] else None})
+            }
+
+
+    def prometheus_text(self):
+        '''
+        Returns the metrics in the Prometheus text exposition format.
+        '''
+
+        lines = []
+        declared = set()
+
+        def declare(name, metric_type):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        with self.lock:
+            declare(f"{self.prefix}_run_start_timestamp_seconds", 'gauge')
+            lines.append(f"{self.prefix}_run_start_timestamp_seconds {self.started}")
+
+            declare(f"{self.prefix}_phase_duration_seconds", 'gauge')
+            for phase, duration in self.phases.items():
+                lines.append(f"{self.prefix}_phase_duration_seconds{self.format_labels((('phase', phase),))} {duration}")
+
+            for (name, labels), value in sorted(self.counters.items()):
+                declare(f"{self.prefix}_{name}", 'counter')
+                lines.append(f"{self.prefix}_{name}{self.format_labels(labels)} {value}")
+
+            for (name, labels), value in sorted(self.gauges.items()):
+                declare(f"{self.prefix}_{name}", 'gauge')
+                lines.append(f"{self.prefix}_{name}{self.format_labels(labels)} {value}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                declare(f"{self.prefix}_{name}", 'histogram')
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f"{self.prefix}_{name}_bucket{self.format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{self.prefix}_{name}_bucket{self.format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{self.prefix}_{name}_sum{self.format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{self.prefix}_{name}_count{self.format_labels(labels)} {histogram['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+
+    def format_labels(self, labels):
+
+        if not labels:
+            return ''
+        escaped = [(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in labels]
+        return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+    def export(self, json_filename=None, prometheus_filename=None):
+        '''
+        Writes the JSON run summary and the Prometheus textfile, if a filename is given. The files
+        are replaced atomically, so a collector never reads a partially written file.
+        '''
+
+        if json_filename:
+            self.write_file(json_filename, json.dumps(self.summary(), indent=2))
+            print(f"Run metrics written to {json_filename}")
+
+        if prometheus_filename:
+            self.write_file(prometheus_filename, self.prometheus_text())
+            print(f"Prometheus metrics written to {prometheus_filename}")
+
+
+    def write_file(self, filename, content):
+
+        temporary_filename = filename + '.tmp'
+        with open(temporary_filename, 'w') as metrics_file:
+            metrics_file.write(content)
+        os.replace(temporary_filename, filename)
+
+
+metrics = RunMetrics()
@@ -0,0 +1,84 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import builtins
+import sys
+import threading
+import time
+
+
+class ImportTimeProfiler():
+    '''
+    Records how long each module that was not imported before takes to import, including
+    the modules it imports itself, and the phase of the run in which it was imported.
+    '''
+
+    def __init__(self):
+
+        self.original_import = builtins.__import__
+        self.phase = 'startup'
+        self.imports = []
+        self.local = threading.local()
+
+
+    def install(self):
+        builtins.__import__ = self.profiled_import
+        return self
+
+
+    def uninstall(self):
+        builtins.__import__ = self.original_import
+
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+
+    def profiled_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+
+        if level != 0 or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        depth = getattr(self.local, 'depth', 0)
+        self.local.depth = depth + 1
+        start = time.perf_counter()
+
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.local.depth = depth
+            if depth == 0:
+                self.imports.append((self.phase, name, time.perf_counter() - start))
+
+
+    def report(self, budget=None):
+        '''
+        Prints the import time per phase and module, slowest first. Warns if the total
+        import time exceeds the budget in seconds.
+        '''
+
+        total_time = sum(duration for _, _, duration in self.imports)
+
+        print("\nStartup profile: import time per phase and module")
+        for phase, name, duration in sorted(self.imports, key=lambda entry: entry[2], reverse=True):
+            print(f"  {phase:<20} {name:<40} {duration * 1000:10.1f} ms")
+        print(f"  {'total':<61} {total_time * 1000:10.1f} ms")
+
+        if budget is not None and total_time > budget:
+            print(f"WARNING: Import time of {total_time:.2f}s exceeds the startup budget of {budget:.2f}s")
+
+        return total_time
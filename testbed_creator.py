@@ -16,64 +16,120 @@ or implied.
 """
 
 
+import os
 import yaml
 from dotenv import load_dotenv
+from run_metrics import metrics
 
 load_dotenv()
 
 class TestbedCreator():
 
-    def __init__(self, dnac_api, testbed_filename, enable_username, enable_password):
+    def __init__(self, dnac_api, testbed_filename, enable_username, enable_password, max_workers=1):
 
         self.dnac_api = dnac_api
         self.testbed_filename = testbed_filename
         self.enable_username = enable_username
         self.enable_password = enable_password
+        self.max_workers = max(1, int(max_workers))
+        self.testbed = None
+        self.testbed_changed = False
 
 
-    def populate_testbed_file(self):
+    def populate_testbed_file(self, target_ips=None):
         '''
         Retrieves all inventory devices of the type Cisco Catalyst 9500 Switch,
         Cisco Catalyst 9200L Switch or Cisco Catalyst 9300 Switch, and populates 
-        the testbed file based on it.
+        the testbed file based on it. With target_ips, only devices with one of these
+        management IPs are added to the testbed. Only added, removed or changed devices are
+        updated in the existing testbed and the file is only written if anything changed.
+        Returns the testbed as dictionary, which can be loaded without reading the file again.
         '''
 
         all_inventory_devices_list = self.get_dnac_inventory_devices()
 
-        if self.format_testbed_info(all_inventory_devices_list, self.testbed_filename):
-            print(f"Successfully created a testbed file with name: {self.testbed_filename}")
-        else:
+        if target_ips is not None:
+            all_inventory_devices_list = [device for device in all_inventory_devices_list
+                                          if device.get('managementIpAddress') in target_ips]
+            print(f"Restricting the testbed to {len(all_inventory_devices_list)} devices in the DNAC VLAN report")
+
+        devices_dict = self.format_testbed_info(all_inventory_devices_list)
+
+        if devices_dict is None:
             print("Error! We could not successfully create a testbed file")
+            return self.testbed
+
+        testbed_dict = self.testbed or self.load_testbed_file()
+        added, removed, changed = self.diff_testbed_devices(testbed_dict['devices'], devices_dict)
+        self.testbed_changed = bool(added or removed or changed)
+        metrics.set('testbed_devices', len(devices_dict))
+        metrics.increment('testbed_changes_total', len(added), change='added')
+        metrics.increment('testbed_changes_total', len(removed), change='removed')
+        metrics.increment('testbed_changes_total', len(changed), change='changed')
+
+        for hostname in removed:
+            del testbed_dict['devices'][hostname]
+        for hostname in added + changed:
+            testbed_dict['devices'][hostname] = devices_dict[hostname]
+
+        self.testbed = testbed_dict
+
+        if self.testbed_changed or not os.path.exists(self.testbed_filename):
+            with open(self.testbed_filename, 'w') as testbed_file:
+                yaml.dump(testbed_dict, testbed_file, default_flow_style=False)
+            print(f"Successfully updated the testbed file with name: {self.testbed_filename} "
+                  f"({len(added)} added, {len(removed)} removed, {len(changed)} changed devices)")
+        else:
+            print(f"Testbed file with name: {self.testbed_filename} is up to date")
+
+        return testbed_dict
+
+
+    def load_testbed_file(self):
+        '''
+        Returns the content of the existing testbed file, or an empty testbed if there is none.
+        '''
+
+        testbed_dict = None
+
+        if os.path.exists(self.testbed_filename):
+            with open(self.testbed_filename) as testbed_file:
+                testbed_dict = yaml.safe_load(testbed_file)
+
+        if not testbed_dict or not testbed_dict.get('devices'):
+            testbed_dict = {'devices': {}}
+
+        return testbed_dict
+
+
+    def diff_testbed_devices(self, existing_devices, inventory_devices):
+        '''
+        Compares the devices of the existing testbed with the devices built from the inventory.
+        Returns the hostnames of the added, removed and changed devices.
+        '''
+
+        added = [hostname for hostname in inventory_devices if hostname not in existing_devices]
+        removed = [hostname for hostname in existing_devices if hostname not in inventory_devices]
+        changed = [hostname for hostname in inventory_devices
+                   if hostname in existing_devices and existing_devices[hostname] != inventory_devices[hostname]]
+
+        return added, removed, changed
 
 
     def get_dnac_inventory_devices(self):
         '''
         Retrieves all inventory devices of the type Cisco Catalyst 9500 Switch,
         Cisco Catalyst 9200L Switch and Cisco Catalyst 9300 Switch.
+        With more than one worker, the pages are fetched concurrently.
         '''
 
-        limit = 500 
-        offset = 1 
-        type = "Cisco Catalyst 9500 Switch&type=Cisco Catalyst 9200L Switch&type=Cisco Catalyst 9300 Switch"
-        filter = f"?type={type}&offset={offset}&limit={limit}"
-        all_inventory_devices_list = []
-        
-        inventory_devices = self.dnac_api.get_device_list(filter=filter)['response']
-        all_inventory_devices_list.extend(inventory_devices)
-
-        while len(inventory_devices) == limit:
-            offset = offset + limit
-            filter = f"?type={type}&offset={offset}&limit={limit}"
-            inventory_devices = self.dnac_api.get_device_list(filter=filter)['response']
-            all_inventory_devices_list.extend(inventory_devices)
+        return self.dnac_api.get_inventory_devices(self.max_workers)
 
-        return all_inventory_devices_list
 
-
-    def format_testbed_info(self, device_list, testbed_filename):
+    def format_testbed_info(self, device_list):
         '''
-        Creates the content of the testbed file based on a list 
-        of inventory devices.
+        Creates the devices section of the testbed file based on a list 
+        of inventory devices. Returns None if a device could not be parsed.
         '''
 
         devices_dict = {}
@@ -101,16 +157,10 @@ class TestbedCreator():
                 devices_dict[hostname] = device_dict
             except Exception as e:
                 print(e)
-                print(f"Exception in parsing filtered_device_list for device {device['hostname']}")
-                return False
-        
-        testbed_dict = {
-            'devices': devices_dict
-        }
+                print(f"Exception in parsing filtered_device_list for device {device.get('hostname')}")
+                return None
 
-        with open(testbed_filename, 'w') as testbed_file:
-            yaml.dump(testbed_dict, testbed_file, default_flow_style=False)
-        return True
+        return devices_dict
 
 
 
@@ -0,0 +1,235 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Queries the uptime history, e.g.:
+
+python3 uptime_history.py runs
+python3 uptime_history.py interface 10.0.0.1 Gi1/0/1
+python3 uptime_history.py down --days 30
+python3 uptime_history.py summary
+"""
+
+import argparse
+import sqlite3
+import time
+import numpy
+import pandas
+from interface_normalizer import InterfaceNameNormalizer
+
+sqlite3.register_adapter(numpy.int64, int)
+sqlite3.register_adapter(numpy.int32, int)
+
+
+class UptimeHistory():
+    '''
+    SQLite store with the rows of the custom report of every run, indexed by device IP,
+    canonical interface name and run timestamp, so the history of an interface or the
+    state of the fleet in a run is read from the index instead of from old reports.
+    '''
+
+    HISTORY_COLUMNS = ['IP Address', 'Interface Name', 'Device Name', 'Location', 'Vlan Id', 'Admin Status',
+                       'Operational Status', 'Uptime Seconds', 'Down Time Seconds']
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS runs (
+            run_ts REAL PRIMARY KEY,
+            run_id TEXT,
+            rows INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS interface_history (
+            run_ts REAL NOT NULL,
+            ip TEXT NOT NULL,
+            interface TEXT NOT NULL,
+            interface_name TEXT,
+            device_name TEXT,
+            location TEXT,
+            vlan_id INTEGER,
+            admin_status TEXT,
+            oper_status TEXT,
+            uptime_seconds INTEGER,
+            down_time_seconds INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS interface_history_interface ON interface_history (ip, interface, run_ts);
+        CREATE INDEX IF NOT EXISTS interface_history_run ON interface_history (run_ts);
+    '''
+
+    def __init__(self, database_filename):
+
+        self.database_filename = database_filename
+        self.interface_normalizer = InterfaceNameNormalizer()
+        self.connection = sqlite3.connect(database_filename)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(self.SCHEMA)
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def record_run(self, run_id=None):
+        '''
+        Returns a report consumer that appends the custom report chunks written to it as one run.
+        The run is only committed if the report was written completely.
+        '''
+        return HistoryRun(self, run_id)
+
+
+    def append_rows(self, run_ts, data_frame):
+
+        rows = data_frame.reindex(columns=self.HISTORY_COLUMNS).astype(object)
+        rows = rows.where(rows.notna(), None)
+        interfaces = self.interface_normalizer.normalize_series(data_frame['Interface Name'].astype(str))
+
+        self.connection.executemany(
+            'INSERT INTO interface_history (run_ts, ip, interface, interface_name, device_name, location, vlan_id, '
+            'admin_status, oper_status, uptime_seconds, down_time_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            ((run_ts, str(row[0]), interface) + row[1:] for row, interface in zip(rows.itertuples(index=False, name=None), interfaces)))
+
+
+    def get_runs(self):
+
+        return self.query('SELECT run_ts, run_id, rows FROM runs ORDER BY run_ts')
+
+
+    def get_interface_history(self, ip_address, interface):
+        '''
+        Returns the state of an interface in every run. The interface can be given with its full
+        or abbreviated name, e.g. GigabitEthernet1/0/1 or Gi1/0/1.
+        '''
+
+        return self.query('SELECT run_ts, device_name, interface_name, vlan_id, admin_status, oper_status, uptime_seconds, '
+                          'down_time_seconds FROM interface_history WHERE ip = ? AND interface = ? ORDER BY run_ts',
+                          (ip_address, self.interface_normalizer.normalize(interface)))
+
+
+    def get_down_interfaces(self, min_days=30, run_ts=None):
+        '''
+        Returns the interfaces that were down for more than min_days in the given run, by default
+        the last run, and since when they are down.
+        '''
+
+        run_ts = run_ts if run_ts is not None else self.last_run_ts()
+        down_interfaces = self.query('SELECT ip, device_name, interface_name, location, vlan_id, admin_status, down_time_seconds, '
+                                     'run_ts - down_time_seconds AS down_since FROM interface_history '
+                                     'WHERE run_ts = ? AND LOWER(oper_status) = ? AND down_time_seconds > ? '
+                                     'ORDER BY down_time_seconds DESC', (run_ts, 'down', min_days * 86400))
+        down_interfaces['down_since'] = self.to_datetime(down_interfaces['down_since'])
+
+        return down_interfaces
+
+
+    def get_fleet_summary(self):
+        '''
+        Returns per run the number of devices, interfaces and down interfaces, and the longest
+        uptime of an up interface.
+        '''
+
+        return self.query('SELECT run_ts, COUNT(DISTINCT ip) AS devices, COUNT(*) AS interfaces, '
+                          'SUM(LOWER(oper_status) = ?) AS down, '
+                          'MAX(CASE WHEN LOWER(oper_status) = ? THEN uptime_seconds END) AS max_uptime_seconds '
+                          'FROM interface_history GROUP BY run_ts ORDER BY run_ts', ('down', 'up'))
+
+
+    def last_run_ts(self):
+
+        return self.connection.execute('SELECT MAX(run_ts) FROM runs').fetchone()[0]
+
+
+    def query(self, sql, parameters=()):
+
+        data_frame = pandas.read_sql_query(sql, self.connection, params=parameters)
+        if 'run_ts' in data_frame.columns:
+            data_frame['run_ts'] = self.to_datetime(data_frame['run_ts'])
+        return data_frame
+
+
+    def to_datetime(self, timestamps):
+
+        return pandas.to_datetime(timestamps, unit='s', utc=True).dt.tz_convert(None)
+
+
+class HistoryRun():
+    '''
+    Appends the chunks of one custom report to the UptimeHistory in a single transaction.
+    '''
+
+    def __init__(self, uptime_history, run_id=None):
+
+        self.uptime_history = uptime_history
+        self.run_id = run_id
+        self.run_ts = None
+        self.rows = 0
+
+
+    def __enter__(self):
+        self.run_ts = time.time()
+        return self
+
+
+    def write(self, data_frame):
+
+        self.uptime_history.append_rows(self.run_ts, data_frame)
+        self.rows += len(data_frame)
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        connection = self.uptime_history.connection
+
+        if exc_type is not None:
+            connection.rollback()
+            return
+
+        connection.execute('INSERT INTO runs (run_ts, run_id, rows) VALUES (?, ?, ?)', (self.run_ts, self.run_id, self.rows))
+        connection.commit()
+        print(f"Appended {self.rows} rows of run {self.run_id or ''} to the uptime history {self.uptime_history.database_filename}")
+
+
+def parse_arguments():
+
+    parser = argparse.ArgumentParser(description="Queries the uptime history of the custom reports.")
+    parser.add_argument('--database', default="uptime_history.db", help="Path of the uptime history database.")
+    subparsers = parser.add_subparsers(dest='query', required=True)
+
+    subparsers.add_parser('runs', help="List the recorded runs.")
+    interface_parser = subparsers.add_parser('interface', help="Show the state of an interface in every run.")
+    interface_parser.add_argument('ip_address')
+    interface_parser.add_argument('interface')
+    down_parser = subparsers.add_parser('down', help="List the interfaces down for more than --days in the last run.")
+    down_parser.add_argument('--days', type=float, default=30)
+    subparsers.add_parser('summary', help="Show the interface counts per run.")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = parse_arguments()
+    uptime_history = UptimeHistory(args.database)
+
+    if args.query == 'runs':
+        result = uptime_history.get_runs()
+    elif args.query == 'interface':
+        result = uptime_history.get_interface_history(args.ip_address, args.interface)
+    elif args.query == 'down':
+        result = uptime_history.get_down_interfaces(args.days)
+    else:
+        result = uptime_history.get_fleet_summary()
+
+    uptime_history.close()
+
+    with pandas.option_context('display.max_rows', None, 'display.width', None):
+        print(result.to_string(index=False) if len(result) else "No matching rows")
@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ReportViewCache():
+
+    def __init__(self, cache_filename, base_url, ttl=86400):
+
+        self.cache_filename = cache_filename
+        self.base_url = base_url
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+
+    def get(self, report_category, view_name):
+        '''
+        Returns the cached (view group id, report view id) for a report category and view
+        of this DNA Center, or None if there is no entry or it is older than ttl seconds.
+        '''
+
+        entry = self.load().get(self.base_url, {}).get(self.key(report_category, view_name))
+
+        if entry is None or time.time() - entry['timestamp'] > self.ttl:
+            return None
+
+        return entry['view_group_id'], entry['report_view_id']
+
+
+    def set(self, report_category, view_name, view_group_id, report_view_id):
+        '''
+        Stores the view group id and report view id for a report category and view of this DNA Center.
+        '''
+
+        with self.lock:
+            cache = self.load()
+            cache.setdefault(self.base_url, {})[self.key(report_category, view_name)] = {
+                'view_group_id': view_group_id,
+                'report_view_id': report_view_id,
+                'timestamp': time.time()
+            }
+            self.save(cache)
+
+
+    def invalidate(self, report_category, view_name):
+        '''
+        Removes the entry for a report category and view of this DNA Center, e.g. after a
+        report could not be scheduled with the cached ids.
+        '''
+
+        with self.lock:
+            cache = self.load()
+            if cache.get(self.base_url, {}).pop(self.key(report_category, view_name), None) is not None:
+                self.save(cache)
+
+
+    def key(self, report_category, view_name):
+        return report_category + '/' + view_name
+
+
+    def load(self):
+
+        if not os.path.exists(self.cache_filename):
+            return {}
+
+        try:
+            with open(self.cache_filename) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable report view cache {self.cache_filename}: {e}")
+            return {}
+
+
+    def save(self, cache):
+        '''
+        Replaces the cache file atomically, via a temporary file of its own in the same folder.
+        Must be called with the lock held.
+        '''
+
+        folder = os.path.dirname(os.path.abspath(self.cache_filename))
+        file_descriptor, temporary_filename = tempfile.mkstemp(prefix=os.path.basename(self.cache_filename), suffix='.tmp', dir=folder)
+
+        try:
+            with os.fdopen(file_descriptor, 'w') as cache_file:
+                json.dump(cache, cache_file, indent=2)
+            os.replace(temporary_filename, self.cache_filename)
+        except BaseException:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+            raise